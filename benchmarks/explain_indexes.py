@@ -0,0 +1,108 @@
+"""Проверка планов запросов аналитики по EXPLAIN
+
+Заполняет базу синтетическими расходами за год и проверяет, что выборка
+за период из AnalyticsEngine (по daily_expense_rollup) использует индекс
+по дню. Сама таблица expenses за период не читается, поэтому индексов
+по дате у нее нет. Код выхода 1, если запрос читает таблицу целиком.
+
+Запуск из корня проекта:
+    python -m benchmarks.explain_indexes --rows 20000
+    python -m benchmarks.explain_indexes --database-url postgresql+asyncpg://...
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="EXPLAIN check for the analytics rollup index")
+    parser.add_argument("--rows", type=int, default=20000, help="synthetic expenses to insert")
+    parser.add_argument("--days", type=int, default=7, help="analytics period to explain")
+    parser.add_argument("--database-url", default=None, help="defaults to a temporary SQLite file")
+    return parser.parse_args()
+
+async def explain(db, statement):
+    """Текст плана запроса (с подставленными параметрами) для текущей базы"""
+    prefix = "EXPLAIN " if db.bind.dialect.name == "postgresql" else "EXPLAIN QUERY PLAN "
+    compiled = statement.compile(db.bind, compile_kwargs={"literal_binds": True})
+    connection = await db.connection()
+    result = await connection.exec_driver_sql(prefix + str(compiled))
+    # SQLite возвращает (id, parent, notused, detail), PostgreSQL - одну колонку
+    return "\n".join(str(row[-1]) for row in result.fetchall())
+
+async def run(args):
+    import random
+    from datetime import datetime, timedelta
+    from sqlalchemy import select, delete, text
+    from database.database import AsyncSessionLocal, create_tables, engine
+    from database.models import Expense, User
+    from database.crud import CategoryCRUD, ExpenseCRUD, RollupCRUD
+    from services.analytics_engine import ROLLUP_WINDOW_SQL, date_range_params
+
+    await create_tables()
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(Expense))
+        for i, name in enumerate(["Ислам", "Куткелди", "Пользователь 3"]):
+            if not (await db.execute(select(User).where(User.full_name == name))).scalar_one_or_none():
+                db.add(User(telegram_id=-(i + 1), full_name=name, is_authorized=True))
+        await db.flush()
+        user_ids = (await db.execute(select(User.id))).scalars().all()
+        category_ids = list((await CategoryCRUD.get_or_create_categories(
+            db, ["Личные затраты", "Инвестиция", "Услуга", "Другое"]
+        )).values())
+
+        now = datetime.now()
+        rows = []
+        for i in range(args.rows):
+            moment = now - timedelta(seconds=random.randint(0, 365 * 24 * 3600))
+            rows.append({
+                'user_id': random.choice(user_ids),
+                'category_id': random.choice(category_ids),
+                'amount': random.randint(50, 5000),
+                'purpose': f"Покупка #{i}",
+                'expense_date': moment,
+                'created_at': moment
+            })
+        await ExpenseCRUD.bulk_create_expenses(db, rows)
+        await RollupCRUD.rebuild(db)
+        await db.commit()
+        # Статистика для планировщика
+        await db.execute(text("ANALYZE"))
+
+        params = date_range_params(args.days)
+        rollup_index = "ux_daily_expense_rollup_day_user_category"
+        checks = [
+            ("analytics: rollup window", ROLLUP_WINDOW_SQL.bindparams(**params), rollup_index),
+        ]
+
+        failed = 0
+        print(f"{engine.dialect.name}+{engine.dialect.driver}, {args.rows} rows, period {args.days} days")
+        for label, statement, index_name in checks:
+            plan = await explain(db, statement)
+            uses_index = index_name in plan
+            failed += not uses_index
+            print(f"\n[{'OK' if uses_index else 'FAIL'}] {label}\n{plan}")
+
+    await engine.dispose()
+    return failed
+
+def main():
+    args = parse_args()
+    temp_dir = None
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        temp_dir = tempfile.TemporaryDirectory()
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{temp_dir.name}/bench.db"
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    try:
+        failed = asyncio.run(run(args))
+    finally:
+        if temp_dir:
+            temp_dir.cleanup()
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Бенчмарк горячих путей Google Sheets на локальном backend
+
+Запускает синхронизацию, добавление расходов и чтение статуса против
+LocalSheetsBackend с заданной задержкой вызова, без сети и credentials.
+
+Запуск из корня проекта:
+    python -m benchmarks.sheets_paths --rows 20000 --latency-ms 150
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Google Sheets hot paths benchmark (local backend)")
+    parser.add_argument("--rows", type=int, default=20000, help="rows in the expenses sheet")
+    parser.add_argument("--appends", type=int, default=50, help="expenses to append")
+    parser.add_argument("--status-reads", type=int, default=50, help="status screen reads")
+    parser.add_argument("--latency-ms", type=float, default=150, help="simulated latency of one API call")
+    parser.add_argument("--quota-error-rate", type=float, default=0.0, help="share of calls failing with 429")
+    return parser.parse_args()
+
+async def timed(label: str, coro_factory, count: int = 1):
+    started = time.perf_counter()
+    await coro_factory()
+    elapsed = time.perf_counter() - started
+    per_op = f"  ({elapsed / count * 1000:8.1f} ms/op)" if count > 1 else ""
+    print(f"{label:<40} {elapsed:7.2f}s{per_op}")
+    return elapsed
+
+async def run(args):
+    from datetime import datetime
+    from sqlalchemy import select
+    from database.database import AsyncSessionLocal, create_tables, engine
+    from database.models import User
+    from services.google_sheets import google_sheets_service, EXPENSES_SHEET, EXPENSE_HEADERS
+    from services.status_cache import status_cache
+    from benchmarks.sync_insert import make_sheet_rows
+
+    await create_tables()
+    async with AsyncSessionLocal() as db:
+        for i, name in enumerate(["Ислам", "Куткелди", "Пользователь 3"]):
+            if not (await db.execute(select(User).where(User.full_name == name))).scalar_one_or_none():
+                db.add(User(telegram_id=-(i + 1), full_name=name, is_authorized=True))
+        await db.commit()
+
+    await google_sheets_service.ensure_connected()
+    # Заполняем лист "Расходы" без имитации задержки и ошибок
+    spreadsheet = google_sheets_service.sheet
+    spreadsheet.latency, spreadsheet.quota_error_rate = 0, 0
+    spreadsheet.add_worksheet(title=EXPENSES_SHEET, rows="1000", cols="7").append_rows(
+        [EXPENSE_HEADERS] + make_sheet_rows(args.rows)
+    )
+    spreadsheet.latency = args.latency_ms / 1000
+    spreadsheet.quota_error_rate = args.quota_error_rate
+
+    print(f"rows={args.rows} latency={args.latency_ms}ms quota_error_rate={args.quota_error_rate}")
+    await timed("sync: first run", google_sheets_service.sync_expenses_from_sheets)
+    await timed("sync: unchanged sheet", google_sheets_service.sync_expenses_from_sheets)
+    await timed("sync: full resync", lambda: google_sheets_service.sync_expenses_from_sheets(full=True))
+
+    async def append_one_by_one():
+        for i in range(args.appends):
+            await google_sheets_service.add_expense_to_sheet("Ислам", 100 + i, f"Бенчмарк #{i}", datetime.now())
+
+    async def append_batch():
+        rows = [
+            ["01.01.2025", "Ислам", 100 + i, "Другое", f"Бенчмарк #{i}", "01.01.2025 10:00:00"]
+            for i in range(args.appends)
+        ]
+        await google_sheets_service.append_expense_rows(rows)
+
+    await timed(f"append: {args.appends} x append_row", append_one_by_one, args.appends)
+    await timed(f"append: 1 x append_rows ({args.appends})", append_batch, args.appends)
+
+    async def status_direct():
+        for _ in range(args.status_reads):
+            await google_sheets_service.get_status_data()
+
+    async def status_cached():
+        for _ in range(args.status_reads):
+            await status_cache.get()
+
+    await timed(f"status: {args.status_reads} direct reads", status_direct, args.status_reads)
+    await timed(f"status: {args.status_reads} cached reads", status_cached, args.status_reads)
+    await engine.dispose()
+
+def main():
+    args = parse_args()
+    temp_dir = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{temp_dir.name}/bench.db"
+    os.environ["SHEETS_BACKEND"] = "local"
+    os.environ["SHEETS_LOCAL_PATH"] = ""
+    os.environ["SHEETS_LOCAL_LATENCY_MS"] = str(args.latency_ms)
+    os.environ["SHEETS_LOCAL_QUOTA_ERROR_RATE"] = str(args.quota_error_rate)
+    # Квоты не должны искажать замеры задержки
+    os.environ.setdefault("SHEETS_READ_QUOTA_PER_MINUTE", "100000")
+    os.environ.setdefault("SHEETS_WRITE_QUOTA_PER_MINUTE", "100000")
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    try:
+        asyncio.run(run(args))
+    finally:
+        temp_dir.cleanup()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Бенчмарк загрузки расходов при синхронизации с Google Sheets
+
+Сравнивает прежнюю построчную вставку (запрос категории и ORM-объект на
+каждую строку) с массовой вставкой _insert_sheet_expenses.
+
+Запуск из корня проекта:
+    python -m benchmarks.sync_insert --rows 50000
+    python -m benchmarks.sync_insert --database-url postgresql+asyncpg://...
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Sheet sync insert benchmark")
+    parser.add_argument("--rows", type=int, default=20000, help="number of sheet rows")
+    parser.add_argument("--database-url", default=None, help="defaults to a temporary SQLite file")
+    return parser.parse_args()
+
+def make_sheet_rows(count: int):
+    """Синтетические строки листа "Расходы" трех пользователей"""
+    users = ["Ислам", "Куткелди", "Пользователь 3"]
+    categories = ["Личные затраты", "Жылдызбек ава", "Инвестиция", "Услуга", "Другое", "Не указана"]
+    rows = []
+    for i in range(count):
+        day = 1 + i % 28
+        month = 1 + (i // 28) % 12
+        rows.append([
+            f"{day:02d}.{month:02d}.2025",
+            users[i % len(users)],
+            str(100 + i % 5000),
+            categories[i % len(categories)],
+            f"Покупка #{i}",
+            f"{day:02d}.{month:02d}.2025 {i % 24:02d}:{i % 60:02d}:{(i // 60) % 60:02d}"
+        ])
+    return rows
+
+async def legacy_insert(db, sheet_expenses, users):
+    """Прежний путь: запрос категории и отдельный ORM-объект на каждую строку"""
+    from database.models import Expense, ExpenseCategory
+    from sqlalchemy import select
+
+    for expense_data in sheet_expenses:
+        user = users[expense_data['user_name']]
+        category_id = None
+        if expense_data['category']:
+            result = await db.execute(select(ExpenseCategory).where(ExpenseCategory.name == expense_data['category']))
+            category = result.scalar_one_or_none()
+            if not category:
+                category = ExpenseCategory(name=expense_data['category'])
+                db.add(category)
+                await db.flush()
+            category_id = category.id
+        db.add(Expense(
+            user_id=user.id,
+            amount=expense_data['amount'],
+            purpose=expense_data['purpose'],
+            category_id=category_id,
+            expense_date=expense_data['created_at'],
+            created_at=expense_data['created_at'],
+            sheet_fingerprint=expense_data['fingerprint']
+        ))
+
+async def run(rows_count: int):
+    from sqlalchemy import select, delete
+    from database.database import AsyncSessionLocal, create_tables, engine
+    from database.models import Expense, ExpenseCategory, User
+    from services.google_sheets import google_sheets_service, _parse_expense_row
+
+    await create_tables()
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(Expense))
+        await db.execute(delete(ExpenseCategory))
+        for i, name in enumerate(["Ислам", "Куткелди", "Пользователь 3"]):
+            if not (await db.execute(select(User).where(User.full_name == name))).scalar_one_or_none():
+                db.add(User(telegram_id=-(i + 1), full_name=name, is_authorized=True))
+        await db.commit()
+        users = {user.full_name: user for user in (await db.execute(select(User))).scalars().all()}
+
+    sheet_expenses = [_parse_expense_row(row) for row in make_sheet_rows(rows_count)]
+
+    results = {}
+    for label, insert in (
+        ("row-by-row (before)", legacy_insert),
+        ("bulk (after)", google_sheets_service._insert_sheet_expenses)
+    ):
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(Expense))
+            await db.execute(delete(ExpenseCategory))
+            await db.commit()
+
+            started = time.perf_counter()
+            await insert(db, sheet_expenses, users)
+            await db.commit()
+            elapsed = time.perf_counter() - started
+        results[label] = elapsed
+        print(f"{label:<22} {rows_count} rows in {elapsed:7.2f}s  ->  {rows_count / elapsed:10.0f} rows/s")
+
+    before, after = results.values()
+    print(f"speedup: x{before / after:.1f} ({engine.dialect.name}+{engine.dialect.driver})")
+    await engine.dispose()
+
+def main():
+    args = parse_args()
+    temp_dir = None
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        temp_dir = tempfile.TemporaryDirectory()
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{temp_dir.name}/bench.db"
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    try:
+        asyncio.run(run(args.rows))
+    finally:
+        if temp_dir:
+            temp_dir.cleanup()
+
+if __name__ == "__main__":
+    main()
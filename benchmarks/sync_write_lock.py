@@ -0,0 +1,99 @@
+"""Проверка: расход сохраняется во время медленной синхронизации
+
+Синхронизация читает лист пачками на локальном backend с задержкой
+каждого чтения, а в это время пользователь сохраняет расход. Сохранение
+не должно ждать окончания синхронизации (блокировку записи SQLite), и
+после синхронизации расход должен остаться в базе. Код выхода 1 - регрессия.
+
+Запуск из корня проекта:
+    python -m benchmarks.sync_write_lock --rows 12000 --latency-ms 2000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Expense save during a slow sheet sync (local backend)")
+    parser.add_argument("--rows", type=int, default=12000, help="rows in the expenses sheet")
+    parser.add_argument("--chunk-rows", type=int, default=5000, help="SYNC_CHUNK_ROWS")
+    parser.add_argument("--latency-ms", type=float, default=2000, help="simulated latency of one API call")
+    parser.add_argument("--max-save-ms", type=float, default=1000, help="fail if saving takes longer")
+    return parser.parse_args()
+
+async def run(args) -> bool:
+    from sqlalchemy import select, func
+    from database.database import AsyncSessionLocal, create_tables, engine
+    from database.models import Expense, User
+    from services.google_sheets import google_sheets_service, EXPENSES_SHEET, EXPENSE_HEADERS
+    from services.expense_service import expense_service
+    from services.chart_warmup import chart_warmup
+    from benchmarks.sync_insert import make_sheet_rows
+
+    await create_tables()
+    async with AsyncSessionLocal() as db:
+        for i, name in enumerate(["Ислам", "Куткелди", "Пользователь 3"]):
+            db.add(User(telegram_id=-(i + 1), full_name=name, is_authorized=True))
+        await db.commit()
+        user = (await db.execute(select(User).where(User.full_name == "Ислам"))).scalar_one()
+
+    await google_sheets_service.ensure_connected()
+    spreadsheet = google_sheets_service.sheet
+    spreadsheet.latency = 0
+    spreadsheet.add_worksheet(title=EXPENSES_SHEET, rows="1000", cols="7").append_rows(
+        [EXPENSE_HEADERS] + make_sheet_rows(args.rows)
+    )
+    spreadsheet.latency = args.latency_ms / 1000
+
+    async def expense_count() -> int:
+        async with AsyncSessionLocal() as db:
+            return (await db.execute(select(func.count(Expense.id)))).scalar()
+
+    print(f"rows={args.rows} chunk={args.chunk_rows} latency={args.latency_ms}ms")
+    sync = asyncio.create_task(google_sheets_service.sync_expenses_from_sheets())
+    # Ждем, пока первая пачка будет записана, а следующая читается: время
+    # изменения, список листов, высота листа и первый диапазон - четыре вызова API
+    deadline = time.perf_counter() + 4.5 * args.latency_ms / 1000
+    while not sync.done() and time.perf_counter() < deadline and not await expense_count():
+        await asyncio.sleep(0.05)
+
+    started = time.perf_counter()
+    expense = await expense_service.save_expense(user, 123, "Во время синхронизации")
+    save_ms = (time.perf_counter() - started) * 1000
+    sync_running = not sync.done()
+    await sync
+    chart_warmup.stop()
+
+    async with AsyncSessionLocal() as db:
+        kept = await db.get(Expense, expense.id) is not None
+    total = await expense_count()
+    await engine.dispose()
+
+    print(f"save during sync: {save_ms:8.1f} ms (sync still running: {sync_running})")
+    print(f"expenses after sync: {total}, saved expense kept: {kept}")
+    ok = sync_running and save_ms <= args.max_save_ms and kept and total == args.rows + 1
+    print("OK" if ok else "FAILED")
+    return ok
+
+def main():
+    args = parse_args()
+    temp_dir = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{temp_dir.name}/bench.db"
+    os.environ["SHEETS_BACKEND"] = "local"
+    os.environ["SHEETS_LOCAL_PATH"] = ""
+    os.environ["SYNC_CHUNK_ROWS"] = str(args.chunk_rows)
+    # Квоты не должны искажать замеры задержки
+    os.environ.setdefault("SHEETS_READ_QUOTA_PER_MINUTE", "100000")
+    os.environ.setdefault("SHEETS_WRITE_QUOTA_PER_MINUTE", "100000")
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    try:
+        ok = asyncio.run(run(args))
+    finally:
+        temp_dir.cleanup()
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
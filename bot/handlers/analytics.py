@@ -2,7 +2,7 @@ from aiogram import Router, F
 from aiogram.types import CallbackQuery, BufferedInputFile
 from aiogram.filters import Command
 from aiogram.types import Message
-from services.analytics import analytics_service
+from services.chart_cache import chart_cache
 from bot.keyboards.inline import get_analytics_keyboard, get_main_menu_keyboard
 import logging
 
@@ -12,6 +12,9 @@ router = Router()
 @router.message(Command("analytics"))
 async def analytics_command(message: Message, current_user):
     """Команда для вызова аналитики"""
+    # Аналитика (NumPy) загружается при первом обращении, а не при старте бота
+    from services.analytics import analytics_service
+    
     keyboard = get_analytics_keyboard()
     
     summary = await analytics_service.get_analytics_summary()
@@ -24,6 +27,8 @@ async def analytics_command(message: Message, current_user):
 @router.callback_query(F.data == "analytics")
 async def show_analytics_menu(callback: CallbackQuery, current_user):
     """Показать меню аналитики"""
+    from services.analytics import analytics_service
+    
     keyboard = get_analytics_keyboard()
     
     summary = await analytics_service.get_analytics_summary()
@@ -37,50 +42,50 @@ async def show_analytics_menu(callback: CallbackQuery, current_user):
 @router.callback_query(F.data.startswith("chart_"))
 async def generate_chart(callback: CallbackQuery, current_user):
     """Генерация и отправка графиков"""
+    from services.analytics import analytics_service, CHART_CAPTIONS
+    
     try:
         chart_type = callback.data.split("_")[1]
         days = int(callback.data.split("_")[2]) if len(callback.data.split("_")) > 2 else 30
         
-        # Показываем индикатор загрузки
-        await callback.answer("📊 Генерирую график...", show_alert=False)
-        
-        # Генерируем график в зависимости от типа
-        if chart_type == "trend":
-            img_buffer = await analytics_service.generate_daily_trend_chart(days)
-            caption = f"📈 Динамика расходов за последние {days} дней"
-            
-        elif chart_type == "pie":
-            img_buffer = await analytics_service.generate_user_pie_chart(days)
-            caption = f"🍰 Распределение расходов по пользователям за {days} дней"
-            
-        elif chart_type == "comparison":
-            img_buffer = await analytics_service.generate_user_comparison_chart(days)
-            caption = f"📊 Сравнение активности пользователей за {days} дней"
-            
-        elif chart_type == "weekly":
-            img_buffer = await analytics_service.generate_weekly_summary_chart()
-            caption = "📅 Недельная сводка расходов"
-            
-        elif chart_type == "category":
-            img_buffer = await analytics_service.generate_category_pie_chart(days)
-            caption = f"📊 Расходы по категориям за {days} дней"
-            
-        else:
+        caption = CHART_CAPTIONS.get(chart_type)
+        if caption is None:
+            await callback.answer()
             await callback.message.answer("❌ Неизвестный тип графика")
             return
+        caption = caption.format(days=days)
+        key = analytics_service.chart_key(chart_type, days)
         
-        # Создаем BufferedInputFile из BytesIO
-        photo = BufferedInputFile(
-            img_buffer.getvalue(),
-            filename=f"{chart_type}_{days}days.png"
-        )
+        # График уже отправлялся при этих данных - пересылаем по file_id
+        file_id = chart_cache.get_file_id(key)
+        if file_id:
+            await callback.answer()
+            try:
+                await callback.message.answer_photo(
+                    photo=file_id,
+                    caption=caption,
+                    reply_markup=get_analytics_keyboard()
+                )
+                logger.info(f"Chart {chart_type} resent by file_id to user {current_user.full_name}")
+                return
+            except Exception as e:
+                logger.warning(f"Cached file_id for chart {chart_type} rejected: {e}")
+                chart_cache.forget_file_id(key)
+        else:
+            # Показываем индикатор загрузки
+            await callback.answer("📊 Генерирую график...", show_alert=False)
         
-        # Отправляем изображение
-        await callback.message.answer_photo(
-            photo=photo,
+        # Готовый PNG из кэша или новая отрисовка
+        image = await analytics_service.get_chart_image(chart_type, days, key)
+        
+        # Отправляем изображение и запоминаем file_id для следующих запросов
+        sent = await callback.message.answer_photo(
+            photo=BufferedInputFile(image, filename=f"{chart_type}_{days}days.png"),
             caption=caption,
             reply_markup=get_analytics_keyboard()
         )
+        if sent.photo:
+            chart_cache.set_file_id(key, sent.photo[-1].file_id)
         
         logger.info(f"Chart {chart_type} generated for user {current_user.full_name}")
         
@@ -95,6 +100,8 @@ async def generate_chart(callback: CallbackQuery, current_user):
 @router.callback_query(F.data.startswith("summary_"))
 async def show_analytics_summary(callback: CallbackQuery, current_user):
     """Показать текстовую сводку аналитики"""
+    from services.analytics import analytics_service
+    
     try:
         days = int(callback.data.split("_")[1])
         
@@ -152,10 +159,16 @@ async def sync_data_command(message: Message, current_user):
     """Команда для синхронизации данных с Google Sheets"""
     from services.google_sheets import google_sheets_service
     
+    # /sync full - полная пересборка локальной базы вместо инкрементальной,
+    # /sync 2026-09 2026-10 - только указанные месяцы (при помесячных листах)
+    command_parts = message.text.split()
+    full = len(command_parts) > 1 and command_parts[1].lower() == "full"
+    months = [part for part in command_parts[1:] if part.lower() != "full"] or None
+    
     await message.answer("🔄 Начинаю синхронизацию с Google Sheets...")
     
     try:
-        await google_sheets_service.sync_expenses_from_sheets()
+        await google_sheets_service.sync_expenses_from_sheets(full=full, months=months)
         await message.answer("✅ Синхронизация завершена!\n\nДанные из Google Sheets загружены в локальную базу.")
         
         logger.info("Data sync completed successfully")
@@ -164,3 +177,21 @@ async def sync_data_command(message: Message, current_user):
         logger.error(f"Sync failed: {e}")
         await message.answer("❌ Ошибка при синхронизации. Проверьте подключение к Google Sheets.")
 
+@router.message(Command("quota"))
+async def sheets_quota_command(message: Message, current_user):
+    """Команда для просмотра расхода квоты Google Sheets"""
+    from services.sheets_rate_limiter import sheets_rate_limiter
+    
+    stats = sheets_rate_limiter.stats()
+    text = (
+        f"📶 <b>Квота Google Sheets</b>\n\n"
+        f"📖 <b>Чтение:</b> {stats.get('read_requests', 0)} запросов, "
+        f"доступно {stats['read_available']}/{stats['read_per_minute']} в минуту\n"
+        f"✍️ <b>Запись:</b> {stats.get('write_requests', 0)} запросов, "
+        f"доступно {stats['write_available']}/{stats['write_per_minute']} в минуту\n\n"
+        f"⏳ Ожидали квоту: чтение {stats.get('read_throttled', 0)}, запись {stats.get('write_throttled', 0)}\n"
+        f"🚫 Ответов 429: {stats.get('rate_limited_429', 0)}, ошибок 5xx: {stats.get('server_errors_5xx', 0)}\n"
+        f"🔁 Повторов: {stats.get('retries', 0)}"
+    )
+    
+    await message.answer(text, parse_mode="HTML")
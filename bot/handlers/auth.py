@@ -3,6 +3,7 @@ from aiogram.filters import Command
 from aiogram.types import Message
 from database.database import AsyncSessionLocal
 from database.crud import UserCRUD
+from services.user_cache import user_cache
 from config import config
 from bot.keyboards.inline import get_main_reply_keyboard
 import logging
@@ -58,6 +59,9 @@ async def auth_handler(message: Message):
                 await db.commit()
                 user = existing_user
             
+            # Отрицательная запись в кэше больше не актуальна
+            user_cache.invalidate(message.from_user.id)
+            
             success_text = (
                 f"✅ <b>Авторизация успешна!</b>\n\n"
                 f"👤 Добро пожаловать, <b>{user.full_name}</b>\n\n"
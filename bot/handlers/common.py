@@ -86,7 +86,10 @@ async def help_text_handler(message: Message, current_user):
         f"• <code>/start</code> - начать работу\n"
         f"• <code>/auth КОД</code> - авторизация\n"
         f"• <code>/analytics</code> - аналитика\n"
-        f"• <code>/sync</code> - синхронизация\n\n"
+        f"• <code>/sync</code> - синхронизация\n"
+        f"• <code>/sync full</code> - полная пересинхронизация\n"
+        f"• <code>/sync 2026-09</code> - синхронизация месяца\n"
+        f"• <code>/quota</code> - расход квоты Google Sheets\n\n"
         
         f"❓ По вопросам обращайтесь к администратору."
     )
@@ -1,12 +1,10 @@
 from aiogram import Router, F
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, CallbackQuery
-from database.database import AsyncSessionLocal
-from database.crud import ExpenseCRUD, ReminderCRUD
-from services.google_sheets import google_sheets_service
+from services.expense_service import expense_service
 from bot.states.expense import ExpenseForm
 from bot.keyboards.inline import get_confirmation_keyboard, get_expense_completed_keyboard, get_category_selection_keyboard
-from datetime import datetime, date
+from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
@@ -55,37 +53,8 @@ async def process_amount(message: Message, state: FSMContext, current_user):
         if amount == 0:
             # Для нулевых расходов сразу сохраняем без дополнительных вопросов
             try:
-                async with AsyncSessionLocal() as db:
-                    # Сохраняем расход в базу данных
-                    expense = await ExpenseCRUD.create_expense(
-                        db=db,
-                        user_id=current_user.id,
-                        amount=0.0,
-                        purpose="Нет расходов",
-                        category_name=None
-                    )
-                    
-                    # Сохраняем в Google Sheets
-                    try:
-                        await google_sheets_service.add_expense_to_sheet(
-                            user_name=current_user.full_name,
-                            amount=0.0,
-                            purpose="Нет расходов",
-                            expense_date=expense.created_at,
-                            category=None
-                        )
-                    except Exception as e:
-                        logger.warning(f"Failed to save to Google Sheets: {e}")
-                    
-                    # Отмечаем напоминание как выполненное
-                    from datetime import date
-                    from database.crud import ReminderCRUD
-                    today = date.today()
-                    pending_reminders = await ReminderCRUD.get_pending_reminders(db, today)
-                    for reminder in pending_reminders:
-                        if reminder.user_id == current_user.id:
-                            await ReminderCRUD.mark_reminder_completed(db, reminder.id)
-                            break
+                # Расход, очередь Google Sheets и закрытие напоминания - одной транзакцией
+                await expense_service.save_expense(current_user, 0.0, "Нет расходов")
                 
                 success_text = (
                     f"✅ <b>Нулевой отчет сохранен!</b>\n\n"
@@ -217,39 +186,13 @@ async def confirm_expense(callback: CallbackQuery, state: FSMContext, current_us
         purpose = data['purpose']
         category = data.get('category')
         
-        async with AsyncSessionLocal() as db:
-            # Сохраняем расход в базу данных
-            expense = await ExpenseCRUD.create_expense(
-                db=db,
-                user_id=current_user.id,
-                amount=amount,
-                purpose=purpose,
-                category_name=category
-            )
-            
-            # Сохраняем в Google Sheets
-            try:
-                await google_sheets_service.add_expense_to_sheet(
-                    user_name=current_user.full_name,
-                    amount=amount,
-                    purpose=purpose,
-                    expense_date=expense.created_at,
-                    category=category
-                )
-            except Exception as e:
-                logger.warning(f"Failed to save to Google Sheets: {e}")
-            
-            # Отмечаем напоминание как выполненное
-            today = date.today()
-            pending_reminders = await ReminderCRUD.get_pending_reminders(db, today)
-            for reminder in pending_reminders:
-                if reminder.user_id == current_user.id:
-                    await ReminderCRUD.mark_reminder_completed(db, reminder.id)
-                    break
+        # Расход, очередь Google Sheets (отправка идет в фоне пачками)
+        # и закрытие напоминаний - одной транзакцией
+        await expense_service.save_expense(current_user, amount, purpose, category)
         
         success_text = (
             f"✅ <b>Расход успешно сохранен!</b>\n\n"
-            f"📊 Данные добавлены в систему учета и Google Таблицу.\n\n"
+            f"📊 Данные сохранены в системе учета и будут отправлены в Google Таблицу.\n\n"
             f"Что дальше?"
         )
         
@@ -1,18 +1,20 @@
 from aiogram import Router, F
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.types import CallbackQuery
-from services.google_sheets import google_sheets_service
-from bot.keyboards.inline import get_main_menu_keyboard
+from services.status_cache import status_cache
+from bot.keyboards.inline import get_main_menu_keyboard, get_status_keyboard
+from utils.helpers import format_age
 import logging
 
 logger = logging.getLogger(__name__)
 router = Router()
 
-async def show_status_data(message_or_callback, current_user):
+async def show_status_data(message_or_callback, current_user, force_refresh: bool = False):
     """Общая функция для показа статуса"""
     """Показать статус финансов"""
     try:
-        # Получаем данные из Google Sheets
-        status_data = await google_sheets_service.get_status_data()
+        # Получаем данные из кэша (при необходимости - из Google Sheets)
+        status_data, age = await status_cache.get(force_refresh=force_refresh)
         
         if not status_data:
             error_text = (
@@ -69,31 +71,33 @@ async def show_status_data(message_or_callback, current_user):
             f"• Затраты на товар: {product_costs:,.2f} сом\n"
             f"• Поступило денег в банк: {total_bank_deposits:,.2f} сом\n\n"
             
-            f"🕐 <i>Данные из Google Таблицы</i>"
+            f"🕐 <i>Данные из Google Таблицы, обновлены {format_age(age or 0)}</i>"
         )
         
         # Определяем тип объекта и отправляем соответственно
         if hasattr(message_or_callback, 'answer') and hasattr(message_or_callback, 'message'):
             # Это CallbackQuery
-            keyboard = get_main_menu_keyboard()
+            keyboard = get_status_keyboard()
             try:
                 await message_or_callback.message.edit_text(
                     status_text,
                     parse_mode="HTML",
                     reply_markup=keyboard
                 )
-            except Exception:
-                # Если не можем редактировать, отправляем новое сообщение
-                await message_or_callback.message.answer(
-                    status_text,
-                    parse_mode="HTML",
-                    reply_markup=keyboard
-                )
+            except Exception as e:
+                # Обновление без изменений (те же суммы и "только что") - сообщение уже актуально,
+                # иначе, если не можем редактировать, отправляем новое сообщение
+                not_modified = isinstance(e, TelegramBadRequest) and "message is not modified" in str(e)
+                if not not_modified:
+                    await message_or_callback.message.answer(
+                        status_text,
+                        parse_mode="HTML",
+                        reply_markup=keyboard
+                    )
             await message_or_callback.answer()
         else:
-            # Это Message
-            from bot.keyboards.inline import get_main_reply_keyboard
-            keyboard = get_main_reply_keyboard()
+            # Это Message (нижняя клавиатура постоянная, добавляем кнопку обновления)
+            keyboard = get_status_keyboard(with_menu=False)
             await message_or_callback.answer(
                 status_text,
                 parse_mode="HTML",
@@ -122,4 +126,9 @@ async def show_status_data(message_or_callback, current_user):
 @router.callback_query(F.data == "status")
 async def show_status(callback: CallbackQuery, current_user):
     """Обработчик кнопки статуса"""
-    await show_status_data(callback, current_user)
\ No newline at end of file
+    await show_status_data(callback, current_user)
+
+@router.callback_query(F.data == "status_refresh")
+async def refresh_status(callback: CallbackQuery, current_user):
+    """Принудительное обновление статуса из Google Sheets"""
+    await show_status_data(callback, current_user, force_refresh=True)
\ No newline at end of file
@@ -10,6 +10,14 @@ def get_main_menu_keyboard() -> InlineKeyboardMarkup:
     ])
     return keyboard
 
+def get_status_keyboard(with_menu: bool = True) -> InlineKeyboardMarkup:
+    """Клавиатура экрана статуса с принудительным обновлением"""
+    buttons = [[InlineKeyboardButton(text="🔄 Обновить", callback_data="status_refresh")]]
+    if with_menu:
+        buttons.extend(get_main_menu_keyboard().inline_keyboard)
+    keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
+    return keyboard
+
 def get_main_reply_keyboard() -> ReplyKeyboardMarkup:
     """Основная клавиатура с командами внизу экрана"""
     keyboard = ReplyKeyboardMarkup(
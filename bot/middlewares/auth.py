@@ -3,6 +3,7 @@ from aiogram import BaseMiddleware
 from aiogram.types import Message, CallbackQuery
 from database.database import AsyncSessionLocal
 from database.crud import UserCRUD
+from services.user_cache import user_cache
 
 class AuthMiddleware(BaseMiddleware):
     """Middleware для проверки авторизации пользователя"""
@@ -21,18 +22,22 @@ class AuthMiddleware(BaseMiddleware):
             if event.text and (event.text.startswith('/auth') or event.text.startswith('/start')):
                 return await handler(event, data)
         
-        # Проверяем авторизацию
-        async with AsyncSessionLocal() as db:
-            user = await UserCRUD.get_user_by_telegram_id(db, event.from_user.id)
-            
-            if not user or not user.is_authorized:
-                auth_message = "❌ Вы не авторизованы. Используйте команду /auth [код]"
-                
-                if isinstance(event, CallbackQuery):
-                    await event.answer(auth_message, show_alert=True)
-                else:  # Message
-                    await event.reply(auth_message)
-                return
+        # Проверяем авторизацию, в базу идем только при промахе кэша
+        telegram_id = event.from_user.id
+        cached, user = user_cache.get(telegram_id)
+        if not cached:
+            async with AsyncSessionLocal() as db:
+                user = await UserCRUD.get_user_by_telegram_id(db, telegram_id)
+            user_cache.set(telegram_id, user)
+        
+        if not user or not user.is_authorized:
+            auth_message = "❌ Вы не авторизованы. Используйте команду /auth [код]"
             
-            data['current_user'] = user
-            return await handler(event, data)
\ No newline at end of file
+            if isinstance(event, CallbackQuery):
+                await event.answer(auth_message, show_alert=True)
+            else:  # Message
+                await event.reply(auth_message)
+            return
+        
+        data['current_user'] = user
+        return await handler(event, data)
\ No newline at end of file
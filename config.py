@@ -8,6 +8,8 @@ class Config:
     GOOGLE_SHEETS_ID = os.getenv("GOOGLE_SHEETS_ID") 
     TIMEZONE = os.getenv("TIMEZONE", "Asia/Bishkek")
     REMINDER_TIME = os.getenv("REMINDER_TIME", "20:00")
+    # Сколько напоминаний отправляется в Telegram одновременно
+    REMINDER_SEND_CONCURRENCY = int(os.getenv("REMINDER_SEND_CONCURRENCY", "10"))
     # Database URL - поддержка PostgreSQL для Railway
     DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./data/bot.db")
     
@@ -16,6 +18,26 @@ class Config:
         DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
     DEBUG = os.getenv("DEBUG", "False").lower() == "true"
     
+    # Профиль запуска: время импорта модулей и этапов до первого getUpdates
+    STARTUP_PROFILE = os.getenv("STARTUP_PROFILE", "False").lower() == "true"
+    STARTUP_PROFILE_TOP = int(os.getenv("STARTUP_PROFILE_TOP", "25"))
+    # Фоновая загрузка модулей аналитики через N секунд после старта (отрицательное - выключить)
+    ANALYTICS_WARMUP_DELAY = float(os.getenv("ANALYTICS_WARMUP_DELAY", "30"))
+    
+    # SQLite: WAL и прагмы соединения (см. README, "Профили базы данных")
+    SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "15000"))
+    SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(64 * 1024 * 1024)))
+    
+    # PostgreSQL: пул соединений и таймаут запроса
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "True").lower() == "true"
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+    
     # Коды авторизации
     AUTH_CODES = {
         os.getenv("AUTH_CODE_USER1"): "Ислам",
@@ -25,5 +47,59 @@ class Config:
     
     # Google Credentials путь
     GOOGLE_CREDENTIALS = "./data/credentials.json"
+    
+    # Backend таблиц: google или local (локальная замена для тестов и бенчмарков)
+    SHEETS_BACKEND = os.getenv("SHEETS_BACKEND", "google").lower()
+    SHEETS_LOCAL_PATH = os.getenv("SHEETS_LOCAL_PATH", "")
+    SHEETS_LOCAL_LATENCY_MS = float(os.getenv("SHEETS_LOCAL_LATENCY_MS", "0"))
+    SHEETS_LOCAL_QUOTA_ERROR_RATE = float(os.getenv("SHEETS_LOCAL_QUOTA_ERROR_RATE", "0"))
+    
+    # Пул потоков для вызовов Google Sheets
+    SHEETS_EXECUTOR_WORKERS = int(os.getenv("SHEETS_EXECUTOR_WORKERS", "4"))
+    SHEETS_EXECUTOR_MAX_PENDING = int(os.getenv("SHEETS_EXECUTOR_MAX_PENDING", "32"))
+    SHEETS_CALL_TIMEOUT = float(os.getenv("SHEETS_CALL_TIMEOUT", "30"))
+    SHEETS_SYNC_TIMEOUT = float(os.getenv("SHEETS_SYNC_TIMEOUT", "120"))
+    # Чтение листа "Расходы" пачками: строк в пачке и пачек в очереди к базе
+    SYNC_CHUNK_ROWS = int(os.getenv("SYNC_CHUNK_ROWS", "5000"))
+    SYNC_QUEUE_CHUNKS = int(os.getenv("SYNC_QUEUE_CHUNKS", "2"))
+    # Помесячные листы "Расходы YYYY-MM" с оглавлением вместо одного листа "Расходы"
+    SHEETS_MONTHLY_SHARDS = os.getenv("SHEETS_MONTHLY_SHARDS", "False").lower() == "true"
+    
+    # Квоты Google Sheets API и повторы при 429/5xx
+    SHEETS_READ_QUOTA_PER_MINUTE = int(os.getenv("SHEETS_READ_QUOTA_PER_MINUTE", "60"))
+    SHEETS_WRITE_QUOTA_PER_MINUTE = int(os.getenv("SHEETS_WRITE_QUOTA_PER_MINUTE", "60"))
+    SHEETS_MAX_RETRIES = int(os.getenv("SHEETS_MAX_RETRIES", "5"))
+    SHEETS_BACKOFF_BASE = float(os.getenv("SHEETS_BACKOFF_BASE", "1"))
+    SHEETS_BACKOFF_MAX = float(os.getenv("SHEETS_BACKOFF_MAX", "64"))
+    
+    # Отложенная запись расходов в Google Sheets (outbox)
+    OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "20"))
+    OUTBOX_FLUSH_INTERVAL = float(os.getenv("OUTBOX_FLUSH_INTERVAL", "10"))
+    OUTBOX_MAX_BATCH_ROWS = int(os.getenv("OUTBOX_MAX_BATCH_ROWS", "500"))
+    OUTBOX_MAX_RETRY_DELAY = float(os.getenv("OUTBOX_MAX_RETRY_DELAY", "600"))
+    
+    # Кэш экрана "📊 Статус" (секунды)
+    STATUS_CACHE_TTL = float(os.getenv("STATUS_CACHE_TTL", "60"))
+    STATUS_CACHE_MAX_STALE = float(os.getenv("STATUS_CACHE_MAX_STALE", "3600"))
+    
+    # Кэш авторизованных пользователей в AuthMiddleware (секунды, число записей)
+    USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "300"))
+    USER_CACHE_NEGATIVE_TTL = float(os.getenv("USER_CACHE_NEGATIVE_TTL", "10"))
+    USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", "10000"))
+    
+    # Пул процессов для графиков: процессов, таймаут отрисовки (секунды),
+    # графиков до перезапуска процесса, способ запуска (spawn/forkserver/fork)
+    CHART_POOL_WORKERS = int(os.getenv("CHART_POOL_WORKERS", "2"))
+    CHART_RENDER_TIMEOUT = float(os.getenv("CHART_RENDER_TIMEOUT", "30"))
+    CHART_WORKER_MAX_RENDERS = int(os.getenv("CHART_WORKER_MAX_RENDERS", "50"))
+    CHART_POOL_START_METHOD = os.getenv("CHART_POOL_START_METHOD", "spawn")
+    # Бюджет памяти кэша готовых графиков (байты)
+    CHART_CACHE_MAX_BYTES = int(os.getenv("CHART_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+    # Графики "<тип>_<дней>", которые рисуются заранее после синхронизации и записи
+    # расходов (пусто - выключить), и пауза перед этим для объединения записей (секунды)
+    CHART_WARMUP_VIEWS = os.getenv(
+        "CHART_WARMUP_VIEWS", "trend_7,trend_30,pie_7,pie_30,category_7,category_30,weekly_7"
+    )
+    CHART_WARMUP_DELAY = float(os.getenv("CHART_WARMUP_DELAY", "30"))
 
 config = Config()
\ No newline at end of file
@@ -1,9 +1,21 @@
-from sqlalchemy import select, and_, func
+from sqlalchemy import select, and_, func, delete, update, insert, bindparam
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
-from database.models import User, Expense, DailyReminder, ExpenseCategory
-from datetime import datetime, date
-from typing import Optional, List
+from database.models import User, Expense, DailyReminder, ExpenseCategory, SheetsOutbox, SheetSyncState, DailyExpenseRollup
+from datetime import datetime, date, timedelta
+from decimal import Decimal
+from typing import Optional, List, Dict, Iterable
+import uuid
+
+# Строк в одном executemany при массовой вставке расходов
+BULK_INSERT_BATCH_SIZE = 5000
+
+def _dialect_insert(db: AsyncSession, model):
+    """INSERT с поддержкой ON CONFLICT для текущей базы"""
+    if db.bind.dialect.name == "postgresql":
+        return postgresql.insert(model)
+    return sqlite.insert(model)
 
 class UserCRUD:
     @staticmethod
@@ -25,6 +37,11 @@ class UserCRUD:
         await db.refresh(user)
         return user
     
+    @staticmethod
+    async def set_last_expense_date(db: AsyncSession, user_id: int, expense_date: datetime):
+        """Дата последнего расхода пользователя (без коммита)"""
+        await db.execute(update(User).where(User.id == user_id).values(last_expense_date=expense_date))
+    
     @staticmethod
     async def get_all_authorized_users(db: AsyncSession) -> List[User]:
         result = await db.execute(select(User).where(User.is_authorized == True))
@@ -32,40 +49,83 @@ class UserCRUD:
 
 class ExpenseCRUD:
     @staticmethod
-    async def create_expense(db: AsyncSession, user_id: int, amount: float, purpose: str, category_name: Optional[str] = None) -> Expense:
-        category_id = None
-        if category_name:
-            # Найти или создать категорию
-            result = await db.execute(select(ExpenseCategory).where(ExpenseCategory.name == category_name))
-            category = result.scalar_one_or_none()
-            if not category:
-                category = ExpenseCategory(name=category_name)
-                db.add(category)
-                await db.flush()
-            category_id = category.id
+    async def create_expense(db: AsyncSession, user_id: int, amount: float, purpose: str, category_name: Optional[str] = None,
+                             commit: bool = True, created_at: Optional[datetime] = None, sheet_uuid: Optional[str] = None,
+                             sheet_fingerprint: Optional[str] = None) -> Expense:
+        from services.category_registry import category_registry
+        
+        # id категории из справочника в памяти, неизвестная создается отдельно
+        category_id = await category_registry.get_id(category_name) if category_name else None
         
+        created_at = created_at or datetime.utcnow()
         expense = Expense(
             user_id=user_id,
             amount=amount,
             purpose=purpose,
-            category_id=category_id
+            category_id=category_id,
+            expense_date=created_at,
+            created_at=created_at,
+            sheet_uuid=sheet_uuid or str(uuid.uuid4()),
+            sheet_fingerprint=sheet_fingerprint
         )
         db.add(expense)
+        await db.flush()
+        # Дневные итоги обновляются в той же транзакции, что и расход
+        await RollupCRUD.add_expense(db, expense)
+        if not commit:
+            # Вызывающий код завершит транзакцию сам (например, вместе с outbox)
+            return expense
         await db.commit()
         await db.refresh(expense)
         return expense
     
+    @staticmethod
+    async def bulk_create_expenses(db: AsyncSession, rows: List[Dict]) -> int:
+        """Массовая вставка расходов без коммита
+
+        Для PostgreSQL через asyncpg используется COPY, для остальных
+        драйверов - пачки Core INSERT через executemany (без ORM и RETURNING).
+        """
+        if not rows:
+            return 0
+        
+        if db.bind.dialect.name == "postgresql" and db.bind.dialect.driver == "asyncpg":
+            columns = list(rows[0].keys())
+            records = [
+                tuple(Decimal(str(row[c])) if c == "amount" else row[c] for c in columns)
+                for row in rows
+            ]
+            connection = await db.connection()
+            raw_connection = await connection.get_raw_connection()
+            await raw_connection.driver_connection.copy_records_to_table(
+                Expense.__tablename__, records=records, columns=columns
+            )
+            return len(rows)
+        
+        for i in range(0, len(rows), BULK_INSERT_BATCH_SIZE):
+            await db.execute(insert(Expense.__table__), rows[i:i + BULK_INSERT_BATCH_SIZE])
+        return len(rows)
+    
+    @staticmethod
+    async def bulk_update_expenses(db: AsyncSession, values_by_id: Dict[int, Dict]):
+        """Обновление расходов по id одним executemany без коммита"""
+        if not values_by_id:
+            return
+        table = Expense.__table__
+        stmt = update(table).where(table.c.id == bindparam("expense_id"))
+        await db.execute(stmt, [{"expense_id": expense_id, **values} for expense_id, values in values_by_id.items()])
+    
     @staticmethod
     async def get_user_expenses_by_date(db: AsyncSession, user_id: int, target_date: date) -> List[Expense]:
         start_datetime = datetime.combine(target_date, datetime.min.time())
-        end_datetime = datetime.combine(target_date, datetime.max.time())
+        end_datetime = start_datetime + timedelta(days=1)
         
         result = await db.execute(
             select(Expense)
             .where(and_(
                 Expense.user_id == user_id,
                 Expense.expense_date >= start_datetime,
-                Expense.expense_date <= end_datetime
+                Expense.expense_date < end_datetime
             ))
         )
         return result.scalars().all()
@@ -73,18 +133,84 @@ class ExpenseCRUD:
     @staticmethod
     async def get_all_expenses_by_date(db: AsyncSession, target_date: date) -> List[Expense]:
         start_datetime = datetime.combine(target_date, datetime.min.time())
-        end_datetime = datetime.combine(target_date, datetime.max.time())
+        end_datetime = start_datetime + timedelta(days=1)
         
         result = await db.execute(
             select(Expense)
             .options(selectinload(Expense.user))
             .where(and_(
                 Expense.expense_date >= start_datetime,
-                Expense.expense_date <= end_datetime
+                Expense.expense_date < end_datetime
             ))
         )
         return result.scalars().all()
 
+class RollupCRUD:
+    @staticmethod
+    async def add_expense(db: AsyncSession, expense: Expense):
+        """Добавление расхода в дневные итоги (без коммита)"""
+        stmt = _dialect_insert(db, DailyExpenseRollup).values(
+            day=expense.expense_date.date(),
+            user_id=expense.user_id,
+            category_id=expense.category_id or 0,
+            total_amount=expense.amount,
+            expense_count=1
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["day", "user_id", "category_id"],
+            set_={
+                "total_amount": DailyExpenseRollup.total_amount + stmt.excluded.total_amount,
+                "expense_count": DailyExpenseRollup.expense_count + 1
+            }
+        )
+        await db.execute(stmt)
+    
+    @staticmethod
+    def rebuild_statements():
+        """DELETE и INSERT ... SELECT для пересчета дневных итогов по expenses"""
+        day = func.date(Expense.expense_date)
+        category_id = func.coalesce(Expense.category_id, 0)
+        totals = (
+            select(day, Expense.user_id, category_id, func.sum(Expense.amount), func.count(Expense.id))
+            .where(Expense.user_id.is_not(None))
+            .group_by(day, Expense.user_id, category_id)
+        )
+        return (
+            delete(DailyExpenseRollup),
+            insert(DailyExpenseRollup).from_select(
+                ["day", "user_id", "category_id", "total_amount", "expense_count"], totals
+            )
+        )
+    
+    @staticmethod
+    async def rebuild(db: AsyncSession):
+        """Полный пересчет дневных итогов одним INSERT ... SELECT (без коммита)"""
+        for stmt in RollupCRUD.rebuild_statements():
+            await db.execute(stmt)
+
+class CategoryCRUD:
+    @staticmethod
+    async def get_or_create_categories(db: AsyncSession, names: Iterable[str]) -> Dict[str, int]:
+        """Словарь имя -> id для категорий, недостающие создаются одним запросом"""
+        names = set(names)
+        if not names:
+            return {}
+        
+        result = await db.execute(select(ExpenseCategory.name, ExpenseCategory.id))
+        category_ids = {name: category_id for name, category_id in result.all()}
+        
+        missing = names - category_ids.keys()
+        if missing:
+            # ON CONFLICT DO NOTHING - категорию мог одновременно создать другой запрос
+            stmt = _dialect_insert(db, ExpenseCategory).values([{"name": name} for name in missing])
+            await db.execute(stmt.on_conflict_do_nothing(index_elements=["name"]))
+            result = await db.execute(
+                select(ExpenseCategory.name, ExpenseCategory.id).where(ExpenseCategory.name.in_(missing))
+            )
+            category_ids.update({name: category_id for name, category_id in result.all()})
+        
+        return category_ids
+
 class ReminderCRUD:
     @staticmethod
     async def create_daily_reminder(db: AsyncSession, user_id: int, reminder_date: datetime) -> DailyReminder:
@@ -97,17 +223,58 @@ class ReminderCRUD:
         await db.refresh(reminder)
         return reminder
     
+    @staticmethod
+    async def create_daily_reminders(db: AsyncSession, user_ids: List[int], reminder_date: datetime) -> int:
+        """Напоминания для всех пользователей одним INSERT (без коммита)"""
+        if not user_ids:
+            return 0
+        await db.execute(
+            insert(DailyReminder),
+            [{"user_id": user_id, "reminder_date": reminder_date} for user_id in user_ids]
+        )
+        return len(user_ids)
+    
+    @staticmethod
+    async def increment_pending_reminders(db: AsyncSession, target_date: date) -> List[tuple]:
+        """reminder_count + 1 для невыполненных напоминаний за день одним UPDATE (без коммита)
+
+        Возвращает пары (telegram_id, новый reminder_count) для рассылки.
+        """
+        start_datetime = datetime.combine(target_date, datetime.min.time())
+        end_datetime = start_datetime + timedelta(days=1)
+        
+        result = await db.execute(
+            update(DailyReminder)
+            .where(and_(
+                DailyReminder.reminder_date >= start_datetime,
+                DailyReminder.reminder_date < end_datetime,
+                DailyReminder.is_completed == False
+            ))
+            .values(reminder_count=DailyReminder.reminder_count + 1)
+            .returning(DailyReminder.user_id, DailyReminder.reminder_count)
+            .execution_options(synchronize_session=False)
+        )
+        counts = result.all()
+        if not counts:
+            return []
+        
+        result = await db.execute(
+            select(User.id, User.telegram_id).where(User.id.in_({user_id for user_id, _ in counts}))
+        )
+        telegram_ids = dict(result.all())
+        return [(telegram_ids[user_id], count) for user_id, count in counts if user_id in telegram_ids]
+    
     @staticmethod
     async def get_pending_reminders(db: AsyncSession, target_date: date) -> List[DailyReminder]:
         start_datetime = datetime.combine(target_date, datetime.min.time())
-        end_datetime = datetime.combine(target_date, datetime.max.time())
+        end_datetime = start_datetime + timedelta(days=1)
         
         result = await db.execute(
             select(DailyReminder)
             .options(selectinload(DailyReminder.user))
             .where(and_(
                 DailyReminder.reminder_date >= start_datetime,
-                DailyReminder.reminder_date <= end_datetime,
+                DailyReminder.reminder_date < end_datetime,
                 DailyReminder.is_completed == False
             ))
         )
@@ -119,4 +286,90 @@ class ReminderCRUD:
         reminder = result.scalar_one_or_none()
         if reminder:
             reminder.is_completed = True
-            await db.commit()
\ No newline at end of file
+            await db.commit()
+    
+    @staticmethod
+    async def complete_user_reminders(db: AsyncSession, user_id: int, target_date: date) -> int:
+        """Закрытие напоминаний пользователя за день одним UPDATE (без коммита)"""
+        start_datetime = datetime.combine(target_date, datetime.min.time())
+        end_datetime = start_datetime + timedelta(days=1)
+        
+        result = await db.execute(
+            update(DailyReminder)
+            .where(and_(
+                DailyReminder.user_id == user_id,
+                DailyReminder.reminder_date >= start_datetime,
+                DailyReminder.reminder_date < end_datetime,
+                DailyReminder.is_completed == False
+            ))
+            .values(is_completed=True)
+        )
+        return result.rowcount
+
+class OutboxCRUD:
+    @staticmethod
+    def add_entry(db: AsyncSession, expense_id: Optional[int], row_data: str) -> SheetsOutbox:
+        """Постановка строки в очередь без коммита - в транзакции расхода"""
+        entry = SheetsOutbox(expense_id=expense_id, row_data=row_data)
+        db.add(entry)
+        return entry
+    
+    @staticmethod
+    async def get_ready_entries(db: AsyncSession, now: datetime, limit: int) -> List[SheetsOutbox]:
+        result = await db.execute(
+            select(SheetsOutbox)
+            .where(SheetsOutbox.next_attempt_at <= now)
+            .order_by(SheetsOutbox.id)
+            .limit(limit)
+        )
+        return result.scalars().all()
+    
+    @staticmethod
+    async def get_pending_expense_ids(db: AsyncSession) -> List[int]:
+        result = await db.execute(select(SheetsOutbox.expense_id).where(SheetsOutbox.expense_id.is_not(None)))
+        return result.scalars().all()
+    
+    @staticmethod
+    async def delete_entries(db: AsyncSession, entry_ids: List[int]):
+        await db.execute(delete(SheetsOutbox).where(SheetsOutbox.id.in_(entry_ids)))
+        await db.commit()
+    
+    @staticmethod
+    async def mark_attempted(db: AsyncSession, entry_ids: List[int]):
+        """Учет попытки отправки до обращения к Google"""
+        await db.execute(
+            update(SheetsOutbox)
+            .where(SheetsOutbox.id.in_(entry_ids))
+            .values(attempts=SheetsOutbox.attempts + 1)
+        )
+        await db.commit()
+    
+    @staticmethod
+    async def mark_failed(db: AsyncSession, entry_ids: List[int], error: str, next_attempt_at: datetime):
+        await db.execute(
+            update(SheetsOutbox)
+            .where(SheetsOutbox.id.in_(entry_ids))
+            .values(
+                last_error=error,
+                next_attempt_at=next_attempt_at
+            )
+        )
+        await db.commit()
+
+class SyncStateCRUD:
+    @staticmethod
+    async def get_checksums(db: AsyncSession) -> Dict[str, str]:
+        result = await db.execute(select(SheetSyncState.sheet_title, SheetSyncState.checksum))
+        return {title: checksum for title, checksum in result.all()}
+    
+    @staticmethod
+    async def set_checksum(db: AsyncSession, sheet_title: str, checksum: str):
+        """Сохранение контрольной суммы листа (без коммита)"""
+        stmt = _dialect_insert(db, SheetSyncState).values(
+            sheet_title=sheet_title, checksum=checksum, synced_at=datetime.utcnow()
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["sheet_title"],
+            set_={"checksum": stmt.excluded.checksum, "synced_at": stmt.excluded.synced_at}
+        )
+        await db.execute(stmt)
@@ -1,14 +1,46 @@
+from sqlalchemy import event, inspect, text, select
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from config import config
 from database.models import Base
 
+def _engine_options(database_url: str) -> dict:
+    """Настройки движка для SQLite и PostgreSQL"""
+    options = {"echo": config.DEBUG}
+    backend = make_url(database_url).get_backend_name()
+    if backend == "sqlite":
+        # Ожидание блокировки на уровне драйвера, прагма busy_timeout ставится ниже
+        options["connect_args"] = {"timeout": config.SQLITE_BUSY_TIMEOUT_MS / 1000}
+    elif backend == "postgresql":
+        options.update(
+            pool_size=config.DB_POOL_SIZE,
+            max_overflow=config.DB_MAX_OVERFLOW,
+            pool_timeout=config.DB_POOL_TIMEOUT,
+            pool_recycle=config.DB_POOL_RECYCLE,
+            pool_pre_ping=config.DB_POOL_PRE_PING,
+            # statement_timeout задается серверу при открытии соединения
+            connect_args={"server_settings": {"statement_timeout": str(config.DB_STATEMENT_TIMEOUT_MS)}}
+        )
+    return options
+
 # Создание движка базы данных
 engine = create_async_engine(
     config.DATABASE_URL,
-    echo=config.DEBUG
+    **_engine_options(config.DATABASE_URL)
 )
 
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine.sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        """WAL: читатели не ждут синхронизацию, писатели ждут busy_timeout"""
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={config.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={config.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={config.SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size={config.SQLITE_MMAP_SIZE}")
+        cursor.close()
+
 # Создание сессий
 AsyncSessionLocal = async_sessionmaker(
     engine, 
@@ -16,10 +48,54 @@ AsyncSessionLocal = async_sessionmaker(
     expire_on_commit=False
 )
 
+# Индексы expenses по дате: выборки за период идут по daily_expense_rollup,
+# а индексы только замедляли вставку расходов. Удаляются при старте
+OBSOLETE_INDEXES = [
+    "ix_expenses_expense_date",
+    "ix_expenses_user_id_expense_date",
+    "ix_expenses_category_id_expense_date",
+]
+
+def _upgrade_schema(sync_conn):
+    """Добавление новых колонок и индексов в уже существующие таблицы"""
+    inspector = inspect(sync_conn)
+    existing_tables = set(inspector.get_table_names())
+
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            column_type = column.type.compile(dialect=sync_conn.dialect)
+            sync_conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
+        # create_all не создает индексы для существующих таблиц
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+    for index_name in OBSOLETE_INDEXES:
+        sync_conn.execute(text(f"DROP INDEX IF EXISTS {index_name}"))
+
+def _backfill_rollup(sync_conn):
+    """Первичное заполнение дневных итогов для базы, где они еще не считались"""
+    from database.crud import RollupCRUD
+    from database.models import DailyExpenseRollup, Expense
+
+    has_rollup = sync_conn.execute(select(DailyExpenseRollup.id).limit(1)).first()
+    has_expenses = sync_conn.execute(select(Expense.id).limit(1)).first()
+    if has_expenses and not has_rollup:
+        for stmt in RollupCRUD.rebuild_statements():
+            sync_conn.execute(stmt)
+
 async def create_tables():
     """Создание всех таблиц в базе данных"""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_upgrade_schema)
+        await conn.run_sync(_backfill_rollup)
 
 async def get_async_session():
     """Получение асинхронной сессии базы данных"""
@@ -31,4 +107,4 @@ async def get_async_session():
             await session.rollback()
             raise
         finally:
-            await session.close()
\ No newline at end of file
+            await session.close()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Numeric
+from sqlalchemy import Column, Integer, String, Boolean, Date, DateTime, ForeignKey, Text, Numeric, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -41,6 +41,10 @@ class Expense(Base):
     purpose = Column(Text, nullable=False)
     expense_date = Column(DateTime, default=datetime.utcnow)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Отпечаток строки листа "Расходы" для инкрементальной синхронизации
+    sheet_fingerprint = Column(String(40), nullable=True, index=True)
+    # Стабильный ключ расхода, скрытая колонка ID листа "Расходы"
+    sheet_uuid = Column(String(36), nullable=True, unique=True, index=True)
     
     # Связи
     user = relationship("User", back_populates="expenses")
@@ -57,4 +61,40 @@ class DailyReminder(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Связь с пользователем
-    user = relationship("User", back_populates="daily_reminders")
\ No newline at end of file
+    user = relationship("User", back_populates="daily_reminders")
+
+class SheetsOutbox(Base):
+    __tablename__ = "sheets_outbox"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    # Без внешнего ключа: синхронизация может пересоздать расход раньше отправки
+    expense_id = Column(Integer, nullable=True)
+    row_data = Column(Text, nullable=False)  # JSON-строка для листа "Расходы"
+    attempts = Column(Integer, default=0)
+    last_error = Column(Text, nullable=True)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class SheetSyncState(Base):
+    __tablename__ = "sheet_sync_state"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    sheet_title = Column(String, unique=True, nullable=False)
+    # Контрольная сумма листа (для всей таблицы - время изменения) на момент последней синхронизации
+    checksum = Column(String, nullable=True)
+    synced_at = Column(DateTime, default=datetime.utcnow)
+
+class DailyExpenseRollup(Base):
+    __tablename__ = "daily_expense_rollup"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, nullable=False)  # DATE(expense_date)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # 0 - без категории: NULL не участвует в уникальном ключе
+    category_id = Column(Integer, nullable=False, default=0)
+    total_amount = Column(Numeric(precision=14, scale=2), nullable=False, default=0)
+    expense_count = Column(Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        Index("ux_daily_expense_rollup_day_user_category", "day", "user_id", "category_id", unique=True),
+    )
@@ -1,9 +1,10 @@
 import asyncio
+import importlib
 import logging
 import sys
-from bot.create_bot import create_bot
-from database.database import create_tables
-from services.scheduler import SchedulerService
+import time
+from services.startup_profile import startup_profile
+from config import config
 
 # Настройка логирования с поддержкой UTF-8
 logging.basicConfig(
@@ -24,34 +25,63 @@ if sys.platform == 'win32':
 
 logger = logging.getLogger(__name__)
 
+async def warm_up_analytics():
+    """Фоновая загрузка модулей аналитики, чтобы первый запрос не ждал импорт"""
+    if config.ANALYTICS_WARMUP_DELAY < 0:
+        return
+    await asyncio.sleep(config.ANALYTICS_WARMUP_DELAY)
+    started = time.perf_counter()
+    # Импорт в потоке: event loop продолжает обрабатывать обновления
+    await asyncio.to_thread(importlib.import_module, "services.analytics")
+    logger.info(f"Analytics modules loaded in background in {time.perf_counter() - started:.2f}s")
+
 async def main():
     """Главная функция запуска бота"""
+    started = time.perf_counter()
     logger.info("Starting Telegram bot...")
     
+    # Тяжелые модули импортируются здесь, а не при импорте main.py: так их не
+    # загружают процессы пула графиков, а профиль запуска видит каждый импорт
+    startup_profile.start()
+    from bot.create_bot import create_bot
+    from database.database import create_tables
+    from services.scheduler import SchedulerService
+    startup_profile.mark("imports")
+    
     try:
         # Создаем таблицы в базе данных
         await create_tables()
         logger.info("Database initialized")
+        startup_profile.mark("database ready")
+        
+        # Справочник категорий в памяти для записи расходов
+        from services.category_registry import category_registry
+        await category_registry.load()
         
         # Создаем бота и диспетчер
         bot, dp = create_bot()
         logger.info("Bot created")
-        
-        # Выполняем начальную синхронизацию данных
-        try:
-            from services.google_sheets import google_sheets_service
-            await google_sheets_service.sync_expenses_from_sheets()
-            logger.info("Initial data sync completed")
-        except Exception as e:
-            logger.warning(f"Initial sync failed: {e}")
+        if startup_profile.enabled:
+            bot.session.middleware(startup_profile.request_middleware())
         
         # Создаем и запускаем планировщик
         scheduler = SchedulerService(bot)
         scheduler.start()
         logger.info("Scheduler started")
         
+        # Фоновая отправка расходов в Google Sheets
+        from services.sheets_outbox import sheets_outbox
+        sheets_outbox.start()
+        
+        # Подключение к Google Sheets и начальная синхронизация идут в фоне,
+        # чтобы бот начал принимать сообщения не дожидаясь Google
+        from services.google_sheets import google_sheets_service
+        sheets_connect = asyncio.create_task(google_sheets_service.connect_in_background())
+        analytics_warmup = asyncio.create_task(warm_up_analytics())
+        
         # Запускаем polling
-        logger.info("Bot is running and ready to work!")
+        startup_profile.mark("polling started")
+        logger.info(f"Bot is running and ready to work! Startup took {time.perf_counter() - started:.2f}s")
         await dp.start_polling(bot)
         
     except Exception as e:
@@ -60,6 +90,18 @@ async def main():
         # Остановка планировщика при завершении
         if 'scheduler' in locals():
             scheduler.stop()
+        if 'sheets_connect' in locals():
+            sheets_connect.cancel()
+        if 'analytics_warmup' in locals():
+            analytics_warmup.cancel()
+        from services.chart_warmup import chart_warmup
+        chart_warmup.stop()
+        if 'sheets_outbox' in locals():
+            await sheets_outbox.stop()
+        from services.sheets_executor import sheets_executor
+        sheets_executor.shutdown()
+        from services.chart_pool import chart_pool
+        chart_pool.shutdown()
         logger.info("Bot stopped")
 
 if __name__ == "__main__":
@@ -0,0 +1,171 @@
+import logging
+from datetime import date, timedelta
+from typing import Dict, List, Tuple
+import numpy as np
+from sqlalchemy import text, bindparam, Date
+from database.database import AsyncSessionLocal
+from services.chart_cache import chart_cache
+from services.shared_tasks import SharedTasks
+
+logger = logging.getLogger(__name__)
+
+# Одна выборка на период: дневные итоги (день, пользователь, категория)
+# из daily_expense_rollup с именами. Стоимость зависит от числа дней
+# в периоде, а не от числа расходов. Фильтр - полуоткрытый интервал
+# по колонке day, чтобы работал индекс
+ROLLUP_WINDOW_SQL = text("""
+    SELECT
+        r.day as day,
+        r.user_id as user_id,
+        u.full_name as user_name,
+        COALESCE(ec.name, 'Без категории') as category_name,
+        r.total_amount as total_amount,
+        r.expense_count as expense_count
+    FROM daily_expense_rollup r
+    JOIN users u ON r.user_id = u.id
+    LEFT JOIN expense_categories ec ON r.category_id = ec.id
+    WHERE r.day >= :start
+    AND r.day < :end
+""").bindparams(bindparam("start", type_=Date()), bindparam("end", type_=Date()))
+
+def date_range_params(days: int) -> Dict[str, date]:
+    """Интервал [N дней назад, завтра)"""
+    today = date.today()
+    return {
+        "start": today - timedelta(days=days),
+        "end": today + timedelta(days=1)
+    }
+
+def _as_date(value) -> date:
+    # SQLite отдает день строкой, PostgreSQL - датой
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+class ExpenseAggregates:
+    """Все сводки за период, посчитанные по одной выборке векторно в NumPy
+
+    Строки (день, пользователь, категория, сумма, количество) кодируются
+    в индексы через np.unique, после чего итоги по дням, пользователям,
+    категориям и матрица день x пользователь считаются через bincount
+    без циклов по строкам.
+    """
+
+    def __init__(self, days: int, rows: List[Tuple]):
+        self.days = days
+        self.row_count = len(rows)
+
+        if rows:
+            columns = list(zip(*rows))
+            day_values = np.array([_as_date(value) for value in columns[0]], dtype="datetime64[D]")
+            user_ids = np.array(columns[1], dtype=np.int64)
+            user_names = np.array(columns[2], dtype=object)
+            category_names = np.array(columns[3], dtype=object)
+            amounts = np.array(columns[4], dtype=np.float64)
+            counts = np.array(columns[5], dtype=np.int64)
+        else:
+            day_values = np.array([], dtype="datetime64[D]")
+            user_ids = counts = np.array([], dtype=np.int64)
+            user_names = category_names = np.array([], dtype=object)
+            amounts = np.array([], dtype=np.float64)
+
+        # Кодирование измерений в плотные индексы
+        self.day_keys, day_index = np.unique(day_values, return_inverse=True)
+        user_keys, user_first, user_index = np.unique(user_ids, return_index=True, return_inverse=True)
+        self.user_names = user_names[user_first]
+        self.category_names, category_index = np.unique(category_names.astype(str), return_inverse=True)
+
+        # Итоги по каждому измерению
+        self.total_amount = float(amounts.sum())
+        self.total_count = int(counts.sum())
+        self.user_amounts = np.bincount(user_index, weights=amounts, minlength=len(user_keys))
+        self.user_counts = np.bincount(user_index, weights=counts, minlength=len(user_keys)).astype(np.int64)
+        self.category_amounts = np.bincount(category_index, weights=amounts, minlength=len(self.category_names))
+        self.category_counts = np.bincount(
+            category_index, weights=counts, minlength=len(self.category_names)
+        ).astype(np.int64)
+
+        # Матрица день x пользователь для трендов и недельной сводки
+        cells = day_index * len(user_keys) + user_index
+        shape = (len(self.day_keys), len(user_keys))
+        size = shape[0] * shape[1]
+        self.day_user_amounts = np.bincount(cells, weights=amounts, minlength=size).reshape(shape)
+        self.day_user_counts = np.bincount(cells, weights=counts, minlength=size).reshape(shape).astype(np.int64)
+        self.day_user_present = np.bincount(cells, minlength=size).reshape(shape) > 0
+        self.day_amounts = self.day_user_amounts.sum(axis=1)
+
+    @property
+    def average_ticket(self) -> float:
+        return self.total_amount / self.total_count if self.total_count else 0.0
+
+    @property
+    def average_per_day(self) -> float:
+        return self.total_amount / self.days if self.days > 0 else 0.0
+
+    def user_totals(self) -> List[Dict]:
+        """Итоги по пользователям, по убыванию суммы"""
+        order = np.argsort(-self.user_amounts, kind="stable")
+        return [
+            {
+                'user_name': self.user_names[i],
+                'total_amount': float(self.user_amounts[i]),
+                'expense_count': int(self.user_counts[i]),
+                'avg_amount': float(self.user_amounts[i] / self.user_counts[i]) if self.user_counts[i] else 0.0
+            }
+            for i in order
+        ]
+
+    def category_totals(self) -> List[Dict]:
+        """Итоги по категориям, по убыванию суммы"""
+        order = np.argsort(-self.category_amounts, kind="stable")
+        return [
+            {
+                'category_name': self.category_names[i],
+                'total_amount': float(self.category_amounts[i]),
+                'expense_count': int(self.category_counts[i]),
+                'avg_amount': float(self.category_amounts[i] / self.category_counts[i]) if self.category_counts[i] else 0.0
+            }
+            for i in order
+        ]
+
+    def day_user_totals(self) -> List[Dict]:
+        """Итоги по дням и пользователям в порядке дней"""
+        day_index, user_index = np.nonzero(self.day_user_present)
+        return [
+            {
+                'date': self.day_keys[d].item(),
+                'total_amount': float(self.day_user_amounts[d, u]),
+                'count': int(self.day_user_counts[d, u]),
+                'user_name': self.user_names[u]
+            }
+            for d, u in zip(day_index, user_index)
+        ]
+
+class AnalyticsEngine:
+    """Сводки по периодам с кэшем на текущую версию данных
+
+    Текстовая сводка и все графики за один период используют один результат:
+    выборка из базы выполняется один раз, пока данные не изменятся
+    (версия chart_cache увеличивается при записи расходов и синхронизации).
+    """
+
+    def __init__(self):
+        self._version = None
+        # Результаты по (дней, сегодня); неудачная выборка повторяется следующим запросом
+        self._results = SharedTasks(keep=True)
+
+    async def get(self, days: int) -> ExpenseAggregates:
+        """Сводки за последние days дней"""
+        if self._version != chart_cache.version:
+            self._version = chart_cache.version
+            self._results.clear()
+
+        # Период сдвигается в полночь, даже если данные не менялись
+        return await self._results.run((days, date.today()), lambda: self._load(days))
+
+    async def _load(self, days: int) -> ExpenseAggregates:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(ROLLUP_WINDOW_SQL, date_range_params(days))
+            rows = result.all()
+        return ExpenseAggregates(days, rows)
+
+# Глобальный экземпляр движка
+analytics_engine = AnalyticsEngine()
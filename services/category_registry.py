@@ -0,0 +1,56 @@
+import asyncio
+import logging
+from typing import Dict, Iterable
+from sqlalchemy import select
+from database.database import AsyncSessionLocal
+from database.models import ExpenseCategory
+
+logger = logging.getLogger(__name__)
+
+class CategoryRegistry:
+    """Справочник категорий имя -> id в памяти процесса
+
+    Загружается при старте и после синхронизации с Google Sheets. Известные
+    категории разрешаются без запроса к базе. Новая категория создается
+    в отдельной короткой транзакции (insert-or-get), поэтому в кэш попадают
+    только закоммиченные id, даже если транзакция вызывающего откатится.
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._lock = asyncio.Lock()
+
+    async def load(self):
+        """Перечитать все категории из базы"""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(ExpenseCategory.name, ExpenseCategory.id))
+            self._ids = {name: category_id for name, category_id in result.all()}
+        logger.info(f"Category registry loaded: {len(self._ids)} categories")
+
+    async def get_id(self, name: str) -> int:
+        """id категории, неизвестная категория создается"""
+        return (await self.get_ids([name]))[name]
+
+    async def get_ids(self, names: Iterable[str]) -> Dict[str, int]:
+        """Словарь имя -> id, запрос к базе только для неизвестных имен
+
+        Вызывать до записи в своей транзакции: новая категория создается
+        в отдельном соединении, а в SQLite пишущая транзакция его заблокирует.
+        """
+        from database.crud import CategoryCRUD
+
+        names = set(names)
+        if not names <= self._ids.keys():
+            async with self._lock:
+                missing = names - self._ids.keys()
+                if missing:
+                    async with AsyncSessionLocal() as db:
+                        # ON CONFLICT DO NOTHING: категорию мог создать другой процесс
+                        category_ids = await CategoryCRUD.get_or_create_categories(db, missing)
+                        await db.commit()
+                    self._ids.update(category_ids)
+                    logger.info(f"Categories registered: {', '.join(sorted(missing))}")
+        return {name: self._ids[name] for name in names}
+
+# Глобальный экземпляр справочника
+category_registry = CategoryRegistry()
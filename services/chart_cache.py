@@ -0,0 +1,74 @@
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# (тип графика, дней, версия данных)
+ChartKey = Tuple[str, int, int]
+
+class ChartCache:
+    """Кэш готовых графиков по (тип, дней, версия данных)
+
+    Версия данных увеличивается при каждой записи расходов и после
+    синхронизации, поэтому устаревший график никогда не отдается, а записи
+    прошлых версий сразу удаляются. PNG хранятся в пределах бюджета памяти
+    с вытеснением давно не запрошенных. После первой отправки запоминается
+    file_id из Telegram, и график пересылается без отрисовки и загрузки.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.version = 0
+        self._images: "OrderedDict[ChartKey, bytes]" = OrderedDict()
+        self._file_ids: Dict[ChartKey, str] = {}
+        self._size = 0
+
+    def key(self, chart_type: str, days: int) -> ChartKey:
+        """Ключ графика для текущей версии данных"""
+        return chart_type, days, self.version
+
+    def bump_version(self):
+        """Данные изменились: графики прошлых версий больше не нужны"""
+        self.version += 1
+        self._images.clear()
+        self._file_ids.clear()
+        self._size = 0
+
+    def contains(self, key: ChartKey) -> bool:
+        """Есть ли график (PNG или file_id)"""
+        return key in self._images or key in self._file_ids
+
+    def get_file_id(self, key: ChartKey) -> Optional[str]:
+        return self._file_ids.get(key)
+
+    def set_file_id(self, key: ChartKey, file_id: str):
+        # Отправка могла закончиться уже после смены версии
+        if key[2] == self.version:
+            self._file_ids[key] = file_id
+
+    def forget_file_id(self, key: ChartKey):
+        """file_id отклонен Telegram - следующий раз отправим байты"""
+        self._file_ids.pop(key, None)
+
+    def get_image(self, key: ChartKey) -> Optional[bytes]:
+        image = self._images.get(key)
+        if image is not None:
+            self._images.move_to_end(key)
+        return image
+
+    def set_image(self, key: ChartKey, image: bytes):
+        if key[2] != self.version or len(image) > self.max_bytes:
+            return
+        previous = self._images.pop(key, None)
+        if previous is not None:
+            self._size -= len(previous)
+        self._images[key] = image
+        self._size += len(image)
+        while self._size > self.max_bytes:
+            _, evicted = self._images.popitem(last=False)
+            self._size -= len(evicted)
+
+# Глобальный экземпляр кэша
+chart_cache = ChartCache(max_bytes=config.CHART_CACHE_MAX_BYTES)
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import multiprocessing
+from typing import Set
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Точки входа в рабочем процессе: matplotlib и pandas импортируются
+# только там, основной процесс их не загружает
+def _init_worker():
+    from services.chart_render import init_worker
+    init_worker()
+
+def _render_chart(name: str, kwargs: dict) -> bytes:
+    from services.chart_render import render_chart
+    return render_chart(name, kwargs)
+
+class ChartPool:
+    """Пул процессов для отрисовки графиков matplotlib
+
+    Отрисовка PNG в 300 dpi занимает сотни миллисекунд CPU, поэтому идет
+    в отдельных процессах, а event loop только ждет результат. В процесс
+    передаются имя графика и простые данные (services/chart_render.py).
+    В пуле не больше заданий, чем процессов: остальные ждут в event loop,
+    поэтому таймаут считает только отрисовку, а не очередь. Процесс
+    перезапускается после max_renders графиков (утечки памяти matplotlib),
+    а при зависании задания пул пересоздается целиком.
+    """
+
+    def __init__(self, workers: int, timeout: float, max_renders: int, start_method: str):
+        self.workers = workers
+        self.timeout = timeout
+        self.max_renders = max_renders
+        self.start_method = start_method
+        self._semaphore = asyncio.Semaphore(workers)
+        self._pool = None
+        self._pending: Set[asyncio.Future] = set()
+
+    @property
+    def pending_jobs(self) -> int:
+        """Сколько графиков сейчас рисуется (пока они есть, другие ждут в очереди)"""
+        return len(self._pending)
+
+    def _get_pool(self):
+        # Процессы запускаются при первом графике, а не при старте бота
+        if self._pool is None:
+            context = multiprocessing.get_context(self.start_method)
+            self._pool = context.Pool(
+                processes=self.workers,
+                initializer=_init_worker,
+                maxtasksperchild=self.max_renders
+            )
+            logger.info(f"Chart pool started: {self.workers} {self.start_method} workers")
+        return self._pool
+
+    async def render(self, name: str, **kwargs) -> bytes:
+        """PNG графика name из services/chart_render.RENDERERS"""
+        loop = asyncio.get_running_loop()
+
+        async with self._semaphore:
+            future = loop.create_future()
+
+            def resolve(result):
+                if not future.done():
+                    future.set_result(result)
+
+            def reject(error):
+                if not future.done():
+                    future.set_exception(error)
+
+            # Колбэки пула вызываются из его служебного потока
+            self._get_pool().apply_async(
+                _render_chart, (name, kwargs),
+                callback=lambda result: loop.call_soon_threadsafe(resolve, result),
+                error_callback=lambda error: loop.call_soon_threadsafe(reject, error)
+            )
+            self._pending.add(future)
+            try:
+                return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Chart {name} timed out after {self.timeout}s, restarting chart pool")
+                self._pending.discard(future)
+                future.cancel()
+                await self._restart()
+                raise
+            finally:
+                self._pending.discard(future)
+
+    async def _restart(self):
+        """Остановка зависших процессов, следующий график запустит новый пул"""
+        pool, self._pool = self._pool, None
+        for future in self._pending:
+            if not future.done():
+                future.set_exception(RuntimeError("Chart pool restarted"))
+        self._pending.clear()
+        if pool is not None:
+            # terminate ждет служебные потоки пула - не в event loop
+            await asyncio.get_running_loop().run_in_executor(None, pool.terminate)
+
+    def shutdown(self):
+        """Остановка пула при завершении бота"""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool = None
+            logger.info("Chart pool stopped")
+
+# Глобальный экземпляр пула
+chart_pool = ChartPool(
+    workers=config.CHART_POOL_WORKERS,
+    timeout=config.CHART_RENDER_TIMEOUT,
+    max_renders=config.CHART_WORKER_MAX_RENDERS,
+    start_method=config.CHART_POOL_START_METHOD
+)
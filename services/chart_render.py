@@ -0,0 +1,189 @@
+"""Отрисовка графиков аналитики в процессах пула (см. services/chart_pool.py)
+
+Функции получают только простые данные (списки, числа, даты) и возвращают
+PNG в байтах. Модуль импортируется в рабочих процессах, основной процесс
+бота matplotlib и pandas для графиков не загружает.
+"""
+import io
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
+from matplotlib import rcParams
+import pandas as pd
+import numpy as np
+from typing import Dict, List
+
+COLORS = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#FFA07A', '#98D8C8', '#F7DC6F', '#BB8FCE', '#85C1E9']
+
+def init_worker():
+    """Настройка matplotlib для русского текста при старте процесса"""
+    rcParams['font.family'] = 'DejaVu Sans'
+    plt.rcParams['axes.unicode_minus'] = False
+
+def _to_png(fig) -> bytes:
+    img_buffer = io.BytesIO()
+    fig.savefig(img_buffer, format='png', dpi=300, bbox_inches='tight')
+    return img_buffer.getvalue()
+
+def render_no_data(message: str) -> bytes:
+    """Заглушка при отсутствии данных"""
+    fig = plt.figure(figsize=(10, 6))
+    try:
+        plt.text(0.5, 0.5, message, ha='center', va='center',
+                fontsize=16, transform=plt.gca().transAxes)
+        plt.title('Аналитика расходов', fontsize=18, pad=20)
+        plt.axis('off')
+        return _to_png(fig)
+    finally:
+        plt.close(fig)
+
+def render_daily_trend(rows: List[Dict], days: int) -> bytes:
+    """График трендов по дням, rows - записи {date, total_amount}"""
+    df = pd.DataFrame(rows)
+    df['date'] = pd.to_datetime(df['date'])
+
+    # Группируем по дате и суммируем
+    daily_totals = df.groupby('date')['total_amount'].sum().reset_index()
+
+    fig = plt.figure(figsize=(12, 6))
+    try:
+        plt.plot(daily_totals['date'], daily_totals['total_amount'],
+                marker='o', linewidth=2, markersize=6, color='#4ECDC4')
+
+        plt.title(f'Динамика расходов за последние {days} дней', fontsize=16, pad=20)
+        plt.xlabel('Дата', fontsize=12)
+        plt.ylabel('Сумма расходов (сом)', fontsize=12)
+
+        # Форматирование осей
+        plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%d.%m'))
+        plt.gca().xaxis.set_major_locator(mdates.DayLocator(interval=max(1, days//10)))
+        plt.xticks(rotation=45)
+
+        plt.grid(True, alpha=0.3)
+        plt.tight_layout()
+        return _to_png(fig)
+    finally:
+        plt.close(fig)
+
+def render_pie(labels: List[str], amounts: List[float], title: str) -> bytes:
+    """Круговая диаграмма с легендой сумм (пользователи или категории)"""
+    fig = plt.figure(figsize=(10, 8))
+    try:
+        wedges, texts, autotexts = plt.pie(amounts, labels=labels, autopct='%1.1f%%',
+                                          colors=COLORS[:len(labels)], startangle=90)
+
+        plt.title(title, fontsize=16, pad=20)
+
+        # Улучшаем читаемость
+        for autotext in autotexts:
+            autotext.set_color('white')
+            autotext.set_fontweight('bold')
+
+        plt.axis('equal')
+
+        # Добавляем легенду с суммами
+        legend_labels = [f'{label}: {amount:,.0f} сом'
+                        for label, amount in zip(labels, amounts)]
+        plt.legend(legend_labels, loc='center left', bbox_to_anchor=(1, 0.5))
+
+        plt.tight_layout()
+        return _to_png(fig)
+    finally:
+        plt.close(fig)
+
+def render_user_comparison(users: List[str], amounts: List[float], counts: List[int], days: int) -> bytes:
+    """Столбчатая диаграмма сравнения пользователей: суммы и число операций"""
+    fig, ax1 = plt.subplots(figsize=(12, 8))
+    try:
+        # Столбцы для сумм
+        x_pos = np.arange(len(users))
+        bars1 = ax1.bar(x_pos - 0.2, amounts, 0.4, label='Сумма расходов',
+                       color='#4ECDC4', alpha=0.8)
+
+        ax1.set_xlabel('Пользователи', fontsize=12)
+        ax1.set_ylabel('Сумма расходов (сом)', color='#4ECDC4', fontsize=12)
+        ax1.tick_params(axis='y', labelcolor='#4ECDC4')
+
+        # Вторая ось для количества операций
+        ax2 = ax1.twinx()
+        bars2 = ax2.bar(x_pos + 0.2, counts, 0.4, label='Количество операций',
+                       color='#FF6B6B', alpha=0.8)
+
+        ax2.set_ylabel('Количество операций', color='#FF6B6B', fontsize=12)
+        ax2.tick_params(axis='y', labelcolor='#FF6B6B')
+
+        ax1.set_xticks(x_pos)
+        ax1.set_xticklabels(users, rotation=45, ha='right')
+        ax1.set_title(f'📊 Сравнение активности пользователей за {days} дней',
+                     fontsize=16, pad=20)
+
+        # Добавляем значения на столбцы
+        for bar, amount in zip(bars1, amounts):
+            height = bar.get_height()
+            ax1.text(bar.get_x() + bar.get_width()/2., height + height*0.01,
+                    f'{amount:,.0f}', ha='center', va='bottom', fontsize=9)
+
+        for bar, count in zip(bars2, counts):
+            height = bar.get_height()
+            ax2.text(bar.get_x() + bar.get_width()/2., height + height*0.01,
+                    f'{count}', ha='center', va='bottom', fontsize=9)
+
+        # Легенда
+        lines1, labels1 = ax1.get_legend_handles_labels()
+        lines2, labels2 = ax2.get_legend_handles_labels()
+        ax1.legend(lines1 + lines2, labels1 + labels2, loc='upper left')
+
+        plt.tight_layout()
+        return _to_png(fig)
+    finally:
+        plt.close(fig)
+
+def render_weekly_summary(rows: List[Dict]) -> bytes:
+    """Stacked bar по дням и пользователям, rows - записи {date, user_name, total_amount}"""
+    df = pd.DataFrame(rows)
+    df['date'] = pd.to_datetime(df['date'])
+
+    pivot_table = df.pivot_table(
+        index='date',
+        columns='user_name',
+        values='total_amount',
+        fill_value=0,
+        aggfunc='sum'
+    )
+
+    fig = plt.figure(figsize=(12, 8))
+    try:
+        bottom = np.zeros(len(pivot_table.index))
+
+        for i, user in enumerate(pivot_table.columns):
+            plt.bar(pivot_table.index, pivot_table[user],
+                   bottom=bottom, label=user, color=COLORS[i % len(COLORS)])
+            bottom += pivot_table[user]
+
+        plt.title('Недельная сводка расходов по дням и пользователям',
+                 fontsize=16, pad=20)
+        plt.xlabel('Дата', fontsize=12)
+        plt.ylabel('Сумма расходов (сом)', fontsize=12)
+
+        plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%d.%m'))
+        plt.xticks(rotation=45)
+        plt.legend()
+        plt.grid(True, alpha=0.3, axis='y')
+        plt.tight_layout()
+        return _to_png(fig)
+    finally:
+        plt.close(fig)
+
+# Имя задания -> функция отрисовки; в процесс передается только имя и данные
+RENDERERS = {
+    "no_data": render_no_data,
+    "daily_trend": render_daily_trend,
+    "pie": render_pie,
+    "user_comparison": render_user_comparison,
+    "weekly_summary": render_weekly_summary,
+}
+
+def render_chart(name: str, kwargs: Dict) -> bytes:
+    """Точка входа задания в рабочем процессе"""
+    return RENDERERS[name](**kwargs)
@@ -0,0 +1,74 @@
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+from services.chart_cache import chart_cache
+from services.chart_pool import chart_pool
+from config import config
+
+logger = logging.getLogger(__name__)
+
+def parse_views(views: str) -> List[Tuple[str, int]]:
+    """Список видов из настройки: trend_7,weekly_7 -> [("trend", 7), ("weekly", 7)]"""
+    parsed = []
+    for view in filter(None, (part.strip() for part in views.split(","))):
+        chart_type, _, days = view.partition("_")
+        try:
+            parsed.append((chart_type, int(days or 30)))
+        except ValueError:
+            logger.warning(f"Ignoring invalid chart warm-up view: {view}")
+    return parsed
+
+class ChartWarmup:
+    """Фоновая отрисовка популярных графиков после изменения данных
+
+    После синхронизации или пачки записей расходов (с паузой delay, чтобы
+    объединить записи) графики из списка рисуются по одному в кэш, и
+    пользователи после напоминания получают готовый PNG. Прогрев уступает
+    пользователям: он останавливается, если пул графиков занят их запросами,
+    и прерывается, если данные снова изменились (запланирован новый).
+    """
+
+    def __init__(self, views: List[Tuple[str, int]], delay: float):
+        self.views = views
+        self.delay = delay
+        self._task: Optional[asyncio.Task] = None
+
+    def schedule(self):
+        """Запланировать прогрев, предыдущий отменяется"""
+        if not self.views:
+            return
+        if self._task and not self._task.done():
+            self._task.cancel()
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        await asyncio.sleep(self.delay)
+        from services.analytics import analytics_service
+
+        version = chart_cache.version
+        rendered = 0
+        for chart_type, days in self.views:
+            if chart_cache.version != version:
+                return
+            if chart_pool.pending_jobs:
+                logger.info(f"Chart warm-up stopped after {rendered} charts: chart pool is busy")
+                return
+            key = analytics_service.chart_key(chart_type, days)
+            if chart_cache.contains(key):
+                continue
+            try:
+                await analytics_service.get_chart_image(chart_type, days, key)
+                rendered += 1
+            except Exception as e:
+                logger.warning(f"Chart warm-up failed on {chart_type}_{days}: {e}")
+                return
+        if rendered:
+            logger.info(f"Chart warm-up rendered {rendered} charts for data version {version}")
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+# Глобальный экземпляр прогрева
+chart_warmup = ChartWarmup(views=parse_views(config.CHART_WARMUP_VIEWS), delay=config.CHART_WARMUP_DELAY)
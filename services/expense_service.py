@@ -0,0 +1,59 @@
+import logging
+import uuid
+from datetime import date, datetime
+from typing import Optional
+from database.database import AsyncSessionLocal
+from database.crud import ExpenseCRUD, ReminderCRUD, UserCRUD
+from database.models import Expense, User
+from services.sheets_outbox import sheets_outbox
+from services.chart_cache import chart_cache
+from services.chart_warmup import chart_warmup
+
+logger = logging.getLogger(__name__)
+
+class ExpenseService:
+    """Сохранение расхода пользователя одной транзакцией
+
+    В одном коммите: расход и дневные итоги, строка outbox для Google Sheets,
+    дата последнего расхода пользователя и закрытие сегодняшних напоминаний.
+    Число запросов не зависит от количества напоминаний. После коммита
+    кэш графиков переходит на новую версию данных.
+    """
+
+    async def save_expense(self, user: User, amount: float, purpose: str,
+                           category_name: Optional[str] = None) -> Expense:
+        from services.google_sheets import build_expense_row, expense_row_fingerprint
+
+        # Строка листа готовится до вставки: отпечаток пишется тем же INSERT,
+        # иначе первая синхронизация сочтет расход измененным в листе
+        created_at = datetime.utcnow()
+        expense_uuid = str(uuid.uuid4())
+        row_data = build_expense_row(user.full_name, amount, purpose, created_at, category_name, expense_uuid)
+        async with AsyncSessionLocal() as db:
+            expense = await ExpenseCRUD.create_expense(
+                db=db,
+                user_id=user.id,
+                amount=amount,
+                purpose=purpose,
+                category_name=category_name,
+                commit=False,
+                created_at=created_at,
+                sheet_uuid=expense_uuid,
+                sheet_fingerprint=expense_row_fingerprint(row_data)
+            )
+            sheets_outbox.enqueue(db, expense.id, row_data)
+            await UserCRUD.set_last_expense_date(db, user.id, expense.expense_date)
+            completed = await ReminderCRUD.complete_user_reminders(db, user.id, date.today())
+            await db.commit()
+
+        # Flusher узнает о новой строке только после коммита
+        sheets_outbox.notify()
+        chart_cache.bump_version()
+        # Прогрев графиков после паузы, чтобы объединить пачку записей
+        chart_warmup.schedule()
+        if completed:
+            logger.info(f"Closed {completed} reminders for user {user.id}")
+        return expense
+
+# Глобальный экземпляр сервиса
+expense_service = ExpenseService()
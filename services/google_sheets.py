@@ -1,121 +1,282 @@
+import asyncio
 import gspread
-from oauth2client.service_account import ServiceAccountCredentials
 from config import config
-from typing import List, Dict
+from services.sheets_backends import get_sheets_backend, cell_text
+from services.sheets_executor import sheets_executor
+from services.sheets_rate_limiter import WRITE, PRIORITY_BACKGROUND
+from typing import List, Dict, Optional, Iterable, Tuple
+from collections import Counter, defaultdict
+import hashlib
 import logging
+import threading
+import time
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+EXPENSES_SHEET = "Расходы"
+STATUS_SHEET = "Статус данные"
+# Колонка G "ID" - скрытый UUID расхода для идемпотентной записи и сверки
+EXPENSE_HEADERS = ["Дата", "Пользователь", "Сумма", "Категория", "Цель", "Время записи", "ID"]
+
+# Помесячные листы "Расходы YYYY-MM" и их оглавление (SHEETS_MONTHLY_SHARDS)
+EXPENSES_INDEX_SHEET = "Расходы индекс"
+EXPENSES_ARCHIVE_SHEET = "Расходы (архив)"
+INDEX_HEADERS = ["Лист", "Месяц", "Строк", "Контрольная сумма"]
+
+# Размер пачки id/отпечатков в IN (...) при синхронизации (лимит параметров SQLite)
+SYNC_DELETE_BATCH_SIZE = 500
+
 class GoogleSheetsService:
-    def __init__(self):
-        self.scope = [
-            'https://spreadsheets.google.com/feeds',
-            'https://www.googleapis.com/auth/drive'
-        ]
-        self.credentials = None
+    def __init__(self, backend=None):
+        self.backend = backend or get_sheets_backend()
         self.client = None
         self.sheet = None
-        self._initialize()
+        # Кэш листов и признак проверенной структуры - на время жизни процесса
+        self._worksheets = {}
+        self._checked_sheets = set()
+        self._cache_lock = threading.Lock()
+        self._append_lock = threading.Lock()
+        # Подключение ленивое: импорт модуля не ходит в сеть
+        self._connect_lock = asyncio.Lock()
+        self._connect_failures = 0
+        self._next_connect_at = 0.0
+        self._sync_lock = asyncio.Lock()
     
-    def _initialize(self):
-        """Инициализация подключения к Google Sheets"""
-        try:
-            import os
-            import json
-            
-            # Сначала пробуем переменную окружения (для Railway)
-            credentials_json = os.getenv("GOOGLE_CREDENTIALS_JSON")
-            if credentials_json:
-                try:
-                    credentials_data = json.loads(credentials_json)
-                    self.credentials = ServiceAccountCredentials.from_json_keyfile_dict(
-                        credentials_data, self.scope
-                    )
-                except json.JSONDecodeError:
-                    logger.error("Invalid GOOGLE_CREDENTIALS_JSON format")
-                    # Fallback на файл
-                    self.credentials = ServiceAccountCredentials.from_json_keyfile_name(
-                        config.GOOGLE_CREDENTIALS, self.scope
-                    )
-            else:
-                # Fallback на файл (для локального запуска)
-                self.credentials = ServiceAccountCredentials.from_json_keyfile_name(
-                    config.GOOGLE_CREDENTIALS, self.scope
-                )
-            self.client = gspread.authorize(self.credentials)
-            self.sheet = self.client.open_by_key(config.GOOGLE_SHEETS_ID)
-            logger.info("Google Sheets connected successfully")
-        except Exception as e:
-            logger.error(f"Error connecting to Google Sheets: {e}")
-            self.client = None
-            self.sheet = None
+    @property
+    def is_connected(self) -> bool:
+        return bool(self.client and self.sheet)
+    
+    def _connect(self):
+        """Подключение к Google Sheets (выполняется в пуле потоков)"""
+        started = time.perf_counter()
+        client, sheet = self.backend.open()
+        # Листы старого подключения больше не действительны
+        self.invalidate_cache()
+        self.client, self.sheet = client, sheet
+        logger.info(f"Google Sheets connected successfully in {time.perf_counter() - started:.2f}s")
+    
+    async def ensure_connected(self) -> bool:
+        """Подключение при первом обращении, после ошибки - повтор с паузой"""
+        if self.is_connected:
+            return True
+        # Пока пауза после неудачной попытки не истекла, обработчики не ждут недоступный Google
+        if time.monotonic() < self._next_connect_at:
+            return False
+        async with self._connect_lock:
+            if self.is_connected:
+                return True
+            try:
+                await sheets_executor.run(self._connect)
+                self._connect_failures = 0
+                return True
+            except Exception as e:
+                delay = min(config.SHEETS_BACKOFF_BASE * 2 ** self._connect_failures, config.SHEETS_BACKOFF_MAX)
+                self._connect_failures += 1
+                self._next_connect_at = time.monotonic() + delay
+                logger.error(f"Error connecting to Google Sheets: {e}, next attempt in {delay:.1f}s")
+                return False
+    
+    def disconnect(self):
+        """Сброс подключения: следующее обращение подключится заново"""
+        self.client = None
+        self.sheet = None
+        self.invalidate_cache()
+    
+    async def connect_in_background(self, sync: bool = True):
+        """Подключение в фоне до первого успеха, затем начальная синхронизация"""
+        while not await self.ensure_connected():
+            await asyncio.sleep(max(self._next_connect_at - time.monotonic(), 0.1))
+        if sync:
+            await self.sync_expenses_from_sheets()
+            logger.info("Initial data sync completed")
     
     async def add_expense_to_sheet(self, user_name: str, amount: float, purpose: str, expense_date: datetime, category: str = None):
         """Добавление расхода в таблицу"""
-        if not self.client or not self.sheet:
+        if not await self.ensure_connected():
             logger.warning("Google Sheets not connected, skipping expense save")
             return
         try:
-            # Получаем или создаем лист "Расходы"
-            try:
-                worksheet = self.sheet.worksheet("Расходы")
-                # Проверяем и обновляем заголовки если нужно
-                headers = worksheet.row_values(1)
-                if "Категория" not in headers:
-                    # Обновляем заголовки для существующего листа
-                    worksheet.update("A1:F1", [["Дата", "Пользователь", "Сумма", "Категория", "Цель", "Время записи"]])
-            except gspread.WorksheetNotFound:
-                worksheet = self.sheet.add_worksheet(title="Расходы", rows="1000", cols="7")
-                # Добавляем заголовки
-                worksheet.append_row(["Дата", "Пользователь", "Сумма", "Категория", "Цель", "Время записи"])
-            
             # Добавляем новую строку
-            row_data = [
-                expense_date.strftime("%d.%m.%Y"),
-                user_name,
-                float(amount),
-                category or "Не указана",
-                purpose,
-                expense_date.strftime("%d.%m.%Y %H:%M:%S")
-            ]
+            row_data = build_expense_row(user_name, amount, purpose, expense_date, category)
             
-            worksheet.append_row(row_data)
+            await sheets_executor.run(self._append_expense_rows, [row_data], kind=WRITE)
             logger.info("Expense added to Google Sheets successfully")
             
         except Exception as e:
             logger.error(f"Error adding expense to Google Sheets: {e}")
     
+    async def append_expense_rows(self, rows: List[List], check_existing: bool = False):
+        """Пакетное добавление строк в лист "Расходы", ошибки пробрасываются для повтора в outbox"""
+        if not await self.ensure_connected():
+            raise RuntimeError("Google Sheets not connected")
+        # check_existing - повторная отправка, строки с ID из листа пропускаются. Повтор
+        # после 5xx в sheets_executor тоже со сверкой: Google мог записать строки
+        attempted = [check_existing]
+        
+        def append_rows():
+            check, attempted[0] = attempted[0], True
+            self._append_expense_rows(rows, check)
+        
+        await sheets_executor.run(append_rows, kind=WRITE)
+        logger.info(f"{len(rows)} expenses appended to Google Sheets")
+    
+    def invalidate_cache(self, title: Optional[str] = None):
+        """Сброс кэша листов: одного листа или всего кэша"""
+        with self._cache_lock:
+            if title is None:
+                self._worksheets.clear()
+                self._checked_sheets.clear()
+            else:
+                self._worksheets.pop(title, None)
+                self._checked_sheets.discard(title)
+    
+    def _handle_sheet_error(self, error: Exception, title: str):
+        """Сброс кэша листа после ошибки, при 401 - и всего подключения"""
+        self.invalidate_cache(title)
+        if getattr(getattr(error, "response", None), "status_code", None) == 401:
+            logger.warning("Google Sheets credentials rejected, reconnecting on next call")
+            self.disconnect()
+    
+    def _get_worksheet(self, title: str):
+        """Лист по названию из кэша, при промахе - запрос к API"""
+        worksheet = self._worksheets.get(title)
+        if worksheet is None:
+            worksheet = self.sheet.worksheet(title)
+            self._worksheets[title] = worksheet
+        return worksheet
+    
+    def _get_expenses_worksheet(self, month: Optional[str] = None):
+        """Получение или создание листа "Расходы" или листа месяца (блокирующий вызов)"""
+        title = month_sheet_title(month) if month else EXPENSES_SHEET
+        with self._cache_lock:
+            try:
+                worksheet = self._get_worksheet(title)
+                # Заголовки проверяем один раз за процесс
+                if title not in self._checked_sheets:
+                    headers = worksheet.row_values(1)
+                    if "ID" not in headers:
+                        # Обновляем заголовки для существующего листа
+                        worksheet.update("A1:G1", [EXPENSE_HEADERS])
+                        worksheet.hide_columns(6, 7)
+            except gspread.WorksheetNotFound:
+                if month:
+                    # Оглавление нужно до первого листа месяца (и переносит старый лист)
+                    index = self._get_index_worksheet()
+                    # Перенос старого листа мог уже создать лист этого месяца
+                    # вместе со строкой оглавления
+                    worksheet = self._worksheets.get(title)
+                    if worksheet is None:
+                        worksheet = self._create_month_sheet(month, [])
+                        index.append_row(_index_row(month), value_input_option="USER_ENTERED")
+                else:
+                    worksheet = self.sheet.add_worksheet(title=EXPENSES_SHEET, rows="1000", cols="7")
+                    # Добавляем заголовки, колонку ID скрываем
+                    worksheet.append_row(EXPENSE_HEADERS)
+                    worksheet.hide_columns(6, 7)
+                    self._worksheets[EXPENSES_SHEET] = worksheet
+            self._checked_sheets.add(title)
+            return worksheet
+    
+    def _get_index_worksheet(self):
+        """Оглавление помесячных листов, при отсутствии - создание (под _cache_lock)"""
+        try:
+            return self._get_worksheet(EXPENSES_INDEX_SHEET)
+        except gspread.WorksheetNotFound:
+            return self._create_month_index()
+    
+    def _create_month_sheet(self, month: str, rows: List[List]):
+        """Создание листа месяца с заголовками и строками (под _cache_lock)"""
+        title = month_sheet_title(month)
+        worksheet = self.sheet.add_worksheet(title=title, rows=str(max(1000, len(rows) + 100)), cols="7")
+        worksheet.append_rows([EXPENSE_HEADERS] + rows)
+        worksheet.hide_columns(6, 7)
+        self._worksheets[title] = worksheet
+        return worksheet
+    
+    def _create_month_index(self):
+        """Создание оглавления с переносом старого листа "Расходы" по месяцам
+
+        Оглавление создается последним, поэтому прерванный перенос
+        повторится при следующем обращении.
+        """
+        months = []
+        try:
+            legacy = self._get_worksheet(EXPENSES_SHEET)
+        except gspread.WorksheetNotFound:
+            legacy = None
+        
+        if legacy is not None:
+            by_month = defaultdict(list)
+            skipped = 0
+            for row in legacy.get_all_values()[1:]:
+                month = _row_month(row)
+                if month:
+                    by_month[month].append(row)
+                elif any(row):
+                    skipped += 1
+            for month in sorted(by_month):
+                try:
+                    worksheet = self._get_worksheet(month_sheet_title(month))
+                    # Лист создан прерванным переносом, но строки не добавлены
+                    if len(worksheet.col_values(1)) <= 1:
+                        worksheet.append_rows(by_month[month])
+                except gspread.WorksheetNotFound:
+                    self._create_month_sheet(month, by_month[month])
+                months.append(month)
+            logger.info(
+                f"Expenses sheet split into {len(months)} monthly sheets, "
+                f"{skipped} rows without valid time left in archive"
+            )
+        
+        index = self.sheet.add_worksheet(title=EXPENSES_INDEX_SHEET, rows=str(max(100, len(months) + 20)), cols="4")
+        index.append_rows([INDEX_HEADERS] + [_index_row(month) for month in months], value_input_option="USER_ENTERED")
+        self._worksheets[EXPENSES_INDEX_SHEET] = index
+        
+        if legacy is not None:
+            legacy.update_title(EXPENSES_ARCHIVE_SHEET)
+            self._worksheets.pop(EXPENSES_SHEET, None)
+        return index
+    
+    def _append_expense_rows(self, rows: List[List], check_existing: bool = False):
+        """Добавление строк в лист "Расходы" или в листы месяцев (выполняется в пуле потоков)"""
+        # Отправки идут по одной: попытка, брошенная по таймауту или отмене,
+        # дописывает строки в своем потоке, и повтор сверит ID уже после нее
+        with self._append_lock:
+            if not config.SHEETS_MONTHLY_SHARDS:
+                self._append_to_sheet(None, rows, check_existing)
+                return
+            by_month = defaultdict(list)
+            for row in rows:
+                by_month[_row_month(row) or datetime.now().strftime("%Y-%m")].append(row)
+            for month, month_rows in by_month.items():
+                self._append_to_sheet(month, month_rows, check_existing)
+    
+    def _append_to_sheet(self, month: Optional[str], rows: List[List], check_existing: bool = False):
+        try:
+            worksheet = self._get_expenses_worksheet(month)
+            if check_existing:
+                # Прошлая попытка могла записать строки, но не дождаться ответа
+                existing = set(worksheet.col_values(7))
+                rows = [row for row in rows if len(row) < 7 or row[6] not in existing]
+                if not rows:
+                    return
+            worksheet.append_rows(rows)
+        except (gspread.WorksheetNotFound, gspread.exceptions.APIError) as e:
+            # Лист могли удалить или переименовать - найдем его заново
+            self._handle_sheet_error(e, month_sheet_title(month) if month else EXPENSES_SHEET)
+            if month:
+                self.invalidate_cache(EXPENSES_INDEX_SHEET)
+            raise
+    
     async def get_status_data(self) -> Dict[str, any]:
         """Получение данных для статуса из таблицы"""
-        if not self.client or not self.sheet:
+        if not await self.ensure_connected():
             logger.warning("Google Sheets not connected, returning empty status")
             return {}
         try:
-            # Получаем лист "Статус данные" 
-            try:
-                worksheet = self.sheet.worksheet("Статус данные")
-                # Проверяем и обновляем структуру если нужно
-                self._update_status_structure(worksheet)
-            except gspread.WorksheetNotFound:
-                # Создаем лист если не существует
-                worksheet = self.sheet.add_worksheet(title="Статус данные", rows="10", cols="2")
-                # Добавляем заголовки и начальные данные
-                initial_data = [
-                    ["Показатель", "Значение"],
-                    ["Общий оборот", "0"],
-                    ["Затраты на товар", "0"], 
-                    ["Личные затраты", "0"],
-                    ["Инвестиции в бизнес", "0"],
-                    ["Счет ISKO.TOOLS", "0"],
-                    ["Счет TANKER", "0"],
-                    ["Остаток в счете", "0"]
-                ]
-                for row in initial_data:
-                    worksheet.append_row(row)
-            
-            # Получаем все данные
-            all_values = worksheet.get_all_values()
+            # Получаем все данные листа "Статус данные"
+            all_values = await sheets_executor.run(self._load_status_values)
             
             # Преобразуем в словарь (пропуская заголовок)
             status_data = {}
@@ -135,13 +296,60 @@ class GoogleSheetsService:
             logger.error(f"Error getting status data: {e}")
             return {}
     
-    def _update_status_structure(self, worksheet):
-        """Обновление структуры листа статуса"""
+    def _load_status_values(self) -> List[List[str]]:
+        """Чтение листа "Статус данные" (выполняется в пуле потоков)"""
         try:
-            # Получаем все данные
+            with self._cache_lock:
+                worksheet = self._get_status_worksheet()
             all_values = worksheet.get_all_values()
+            
+            # Проверяем и обновляем структуру один раз за процесс,
+            # используя уже прочитанные данные
+            with self._cache_lock:
+                if STATUS_SHEET not in self._checked_sheets:
+                    changed = self._update_status_structure(worksheet, all_values)
+                    if changed:
+                        all_values = worksheet.get_all_values()
+                    if changed is not None:
+                        # После ошибки миграция повторится при следующем чтении
+                        self._checked_sheets.add(STATUS_SHEET)
+            
+            return all_values
+        except (gspread.WorksheetNotFound, gspread.exceptions.APIError) as e:
+            self._handle_sheet_error(e, STATUS_SHEET)
+            raise
+    
+    def _get_status_worksheet(self):
+        """Получение или создание листа "Статус данные" (блокирующий вызов)"""
+        # Получаем лист "Статус данные" 
+        try:
+            worksheet = self._get_worksheet(STATUS_SHEET)
+        except gspread.WorksheetNotFound:
+            # Создаем лист если не существует
+            worksheet = self.sheet.add_worksheet(title=STATUS_SHEET, rows="10", cols="2")
+            # Добавляем заголовки и начальные данные
+            initial_data = [
+                ["Показатель", "Значение"],
+                ["Общий оборот", "0"],
+                ["Затраты на товар", "0"], 
+                ["Личные затраты", "0"],
+                ["Инвестиции в бизнес", "0"],
+                ["Счет ISKO.TOOLS", "0"],
+                ["Счет TANKER", "0"],
+                ["Остаток в счете", "0"]
+            ]
+            for row in initial_data:
+                worksheet.append_row(row)
+            self._worksheets[STATUS_SHEET] = worksheet
+            self._checked_sheets.add(STATUS_SHEET)
+        return worksheet
+    
+    def _update_status_structure(self, worksheet, all_values: List[List[str]]) -> Optional[bool]:
+        """Обновление структуры листа статуса, True если лист изменился, None при ошибке"""
+        try:
             if not all_values:
-                return
+                return False
+            changed = False
             
             # Проверяем нужно ли обновлять структуру
             existing_keys = [row[0] for row in all_values[1:] if len(row) >= 1]
@@ -165,6 +373,7 @@ class GoogleSheetsService:
                 for i, row in enumerate(all_values):
                     if len(row) >= 1 and row[0] == "Долги в рынке":
                         worksheet.update_cell(i+1, 1, "Затраты на товар")
+                        changed = True
                         break
             
             # Переименование магазинов
@@ -172,12 +381,14 @@ class GoogleSheetsService:
                 for i, row in enumerate(all_values):
                     if len(row) >= 1 and (row[0] == "Оборот магазин 1" or row[0] == "Счет магазин 1"):
                         worksheet.update_cell(i+1, 1, "Счет ISKO.TOOLS")
+                        changed = True
                         break
                         
             if "Оборот магазин 2" in existing_keys or "Счет магазин 2" in existing_keys:
                 for i, row in enumerate(all_values):
                     if len(row) >= 1 and (row[0] == "Оборот магазин 2" or row[0] == "Счет магазин 2"):
                         worksheet.update_cell(i+1, 1, "Счет TANKER")
+                        changed = True
                         break
             
             # Добавляем отсутствующие поля
@@ -185,104 +396,481 @@ class GoogleSheetsService:
             
             if "Остаток в счете" not in current_data:
                 worksheet.append_row(["Остаток в счете", "0"])
-                
-            logger.info("Status structure updated successfully")
+                changed = True
+            
+            if changed:
+                logger.info("Status structure updated successfully")
+            return changed
             
         except Exception as e:
             logger.error(f"Error updating status structure: {e}")
+            return None
     
-    async def sync_expenses_from_sheets(self):
+    async def sync_expenses_from_sheets(self, full: bool = False, months: Optional[Iterable[str]] = None):
         """Синхронизация расходов из Google Sheets в локальную базу"""
+        if not await self.ensure_connected():
+            logger.warning("Google Sheets not connected, skipping sync")
+            return
+        # Запуски не пересекаются: каждый сверяет лист со своим снимком id
+        async with self._sync_lock:
+            await self._sync_expenses(full, months)
+    
+    async def _sync_expenses(self, full: bool, months: Optional[Iterable[str]]):
         try:
             from database.database import AsyncSessionLocal
             from database.models import Expense, User
-            from database.crud import ExpenseCRUD
-            from sqlalchemy import select, delete
-            from datetime import datetime
+            from database.crud import OutboxCRUD, SyncStateCRUD, RollupCRUD
+            from sqlalchemy import select, func
+            
+            # Время изменения таблицы - один легкий запрос вместо чтения листов
+            modified_time = await sheets_executor.run(self._load_modified_time, priority=PRIORITY_BACKGROUND)
+            
+            async with AsyncSessionLocal() as db:
+                # Получаем всех пользователей
+                users_result = await db.execute(select(User))
+                users = {user.full_name: user for user in users_result.scalars().all()}
+                
+                # Расходы из outbox еще не дошли до листа - их не трогаем
+                unsent_ids = set(await OutboxCRUD.get_pending_expense_ids(db))
+                max_id = (await db.execute(select(func.max(Expense.id)))).scalar() or 0
+                checksums = await SyncStateCRUD.get_checksums(db)
+            
+            # Строки неизвестных пользователей пропускаются, поэтому с новым
+            # пользователем неизмененный лист нужно прочитать заново
+            users_key = _users_key(users)
+            state_key = f"spreadsheet:{self.sheet.id}"
+            marker = f"{modified_time}|{users_key}" if modified_time else None
+            if marker and not full and months is None and checksums.get(state_key) == marker:
+                logger.info("Spreadsheet unchanged since last sync, skipping")
+                return
             
-            # Получаем данные из Google Sheets
             try:
-                worksheet = self.sheet.worksheet("Расходы")
-                all_values = worksheet.get_all_values()
+                sources = await sheets_executor.run(self._load_sync_sources, priority=PRIORITY_BACKGROUND)
             except gspread.WorksheetNotFound:
                 logger.info("No expenses sheet found in Google Sheets")
                 return
+            # months - только листы месяцев "YYYY-MM", полная пересборка всегда читает все листы
+            if months is not None and not full:
+                months = set(months)
+                sources = [source for source in sources if source[1] is None or source[1] in months]
             
-            if len(all_values) <= 1:  # Только заголовок или пусто
-                # Google Sheets пустая - очищаем локальную базу
-                async with AsyncSessionLocal() as db:
-                    # Удаляем все расходы
-                    await db.execute(delete(Expense))
-                    await db.commit()
-                    logger.info("Local expenses cleared - Google Sheets is empty")
-                return
+            # Битовая карта совпавших с листом расходов: байт на id. Расходы,
+            # созданные после этого снимка (пользователями или самой
+            # синхронизацией), в сверку и удаление не входят
+            matched = bytearray(max_id + 1)
             
-            # Получаем данные из Google Sheets (пропускаем заголовок)
-            sheet_expenses = []
-            for row in all_values[1:]:
-                if len(row) >= 6:
-                    try:
-                        category_value = row[3] if len(row) > 3 and row[3] and row[3].strip() != "Не указана" else None
-                        
-                        expense_data = {
-                            'date': datetime.strptime(row[0], "%d.%m.%Y").date(),
-                            'user_name': row[1],
-                            'amount': float(row[2]),
-                            'category': category_value,
-                            'purpose': row[4],
-                            'created_at': datetime.strptime(row[5], "%d.%m.%Y %H:%M:%S")
-                        }
-                        
-                        sheet_expenses.append(expense_data)
-                    except (ValueError, IndexError) as e:
-                        logger.warning(f"Skipping invalid row in Google Sheets: {row}, error: {e}")
+            current_month = datetime.now().strftime("%Y-%m")
+            # Счетчики пополняются после коммита каждой пачки, в том числе до ошибки
+            progress = Counter()
+            deleted = skipped = 0
+            synced = []
+            error = None
+            try:
+                for title, month, checksum in sources:
+                    # Сумма месяца тоже зависит от набора пользователей: строки
+                    # нового пользователя в закрытом месяце еще не загружены
+                    if checksum:
+                        checksum = f"{checksum}|{users_key}"
+                    # Закрытый месяц с прежней контрольной суммой в оглавлении не перечитывается
+                    if (not full and month and month < current_month and checksum
+                            and checksums.get(title) == checksum):
+                        skipped += 1
                         continue
+                    
+                    # Каждая пачка листа коммитится отдельно, full обновляет все совпавшие
+                    # расходы, а не совпавшие удалит сверка в завершающей транзакции
+                    period = _month_bounds(month) if month else None
+                    await self._sync_sheet(title, period, users, matched, progress, full)
+                    synced.append((title, month, period, checksum))
+            except Exception as e:
+                error = e
+            total, inserted, updated = progress["total"], progress["inserted"], progress["updated"]
             
-            # Синхронизируем с локальной базой
             async with AsyncSessionLocal() as db:
-                # Получаем всех пользователей
-                users_result = await db.execute(select(User))
-                users = {user.full_name: user for user in users_result.scalars().all()}
-                
-                # Очищаем существующие расходы
-                await db.execute(delete(Expense))
+                # При ошибке чтения удаления не выполняются: часть листа не прочитана,
+                # а уже записанные пачки сверятся следующим запуском
+                if error is None:
+                    for title, month, period, checksum in synced:
+                        # Пустой лист означает удаление всех сверенных расходов его периода
+                        deleted += await self._delete_unmatched(db, matched, unsent_ids, period)
+                        if month:
+                            await SyncStateCRUD.set_checksum(db, title, checksum)
+                    
+                    # Время изменения, прочитанное до синхронизации: правки во время
+                    # чтения листов будут подхвачены следующим запуском
+                    if marker and months is None:
+                        await SyncStateCRUD.set_checksum(db, state_key, marker)
                 
-                # Добавляем расходы из Google Sheets
-                for expense_data in sheet_expenses:
-                    user = users.get(expense_data['user_name'])
-                    if user:
-                        # Create expense with proper parameters
-                        from database.models import Expense, ExpenseCategory
-                        from sqlalchemy import select
-                        
-                        # Get or create category
-                        category_id = None
-                        if expense_data['category']:
-                            result = await db.execute(select(ExpenseCategory).where(ExpenseCategory.name == expense_data['category']))
-                            category = result.scalar_one_or_none()
-                            if not category:
-                                category = ExpenseCategory(name=expense_data['category'])
-                                db.add(category)
-                                await db.flush()
-                            category_id = category.id
-                        
-                        # Create expense
-                        expense = Expense(
-                            user_id=user.id,
-                            amount=expense_data['amount'],
-                            purpose=expense_data['purpose'],
-                            category_id=category_id,
-                            expense_date=expense_data['created_at'],
-                            created_at=expense_data['created_at']
-                        )
-                        db.add(expense)
+                # Дневные итоги аналитики пересчитываются, только если данные менялись,
+                # в том числе после ошибки, если часть пачек уже записана
+                if inserted or updated or deleted:
+                    await RollupCRUD.rebuild(db)
                 
                 # КРИТИЧЕСКИ ВАЖНО: Коммитим изменения!
                 await db.commit()
-                logger.info(f"Synced {len(sheet_expenses)} expenses from Google Sheets to local database")
+            
+            # Синхронизация могла добавить категории из листа
+            if inserted or updated:
+                from services.category_registry import category_registry
+                await category_registry.load()
+            
+            # Готовые графики построены по старым данным
+            if inserted or updated or deleted:
+                from services.chart_cache import chart_cache
+                chart_cache.bump_version()
+            
+            if error is not None:
+                raise error
+            
+            if full:
+                logger.info(f"Full sync: {total} expenses loaded from Google Sheets, {deleted} deleted")
+            else:
+                closed = f", {skipped} closed months skipped" if config.SHEETS_MONTHLY_SHARDS else ""
+                logger.info(
+                    f"Incremental sync: {inserted} inserted, {updated} updated, {deleted} deleted, "
+                    f"{total - inserted - updated} unchanged{closed}"
+                )
                 
         except Exception as e:
             logger.error(f"Error syncing expenses from Google Sheets: {e}")
+    
+    def _load_modified_time(self) -> Optional[str]:
+        """Время последнего изменения таблицы по Drive API, None если недоступно"""
+        try:
+            return self.sheet.get_lastUpdateTime()
+        except Exception as e:
+            logger.warning(f"Could not get spreadsheet modified time: {e}")
+            return None
+    
+    def _load_sync_sources(self) -> List[Tuple[str, Optional[str], str]]:
+        """Листы расходов для синхронизации: (название, месяц, контрольная сумма)"""
+        if not config.SHEETS_MONTHLY_SHARDS:
+            self._get_expenses_handle(EXPENSES_SHEET)
+            return [(EXPENSES_SHEET, None, "")]
+        try:
+            with self._cache_lock:
+                index = self._get_index_worksheet()
+            values = index.get_all_values()
+        except (gspread.WorksheetNotFound, gspread.exceptions.APIError) as e:
+            self._handle_sheet_error(e, EXPENSES_INDEX_SHEET)
+            raise
+        return [
+            (row[0], row[1], row[3] if len(row) > 3 else "")
+            for row in values[1:]
+            if len(row) > 1 and row[0] and row[1]
+        ]
+    
+    async def _sync_sheet(self, title: str, period: Optional[Tuple[datetime, datetime]],
+                          users: Dict, matched: bytearray, progress: Counter, force: bool = False):
+        """Потоковая загрузка одного листа, в progress - строк в листе, вставлено, обновлено"""
+        from database.database import AsyncSessionLocal
+        
+        chunks = asyncio.Queue(maxsize=config.SYNC_QUEUE_CHUNKS)
+        reader = asyncio.create_task(self._read_expense_chunks(chunks, title))
+        foreign = 0
+        try:
+            while True:
+                chunk = await chunks.get()
+                if chunk is None:
+                    break
+                if isinstance(chunk, Exception):
+                    raise chunk
+                
+                # Строки неизвестных пользователей в базу не попадают
+                sheet_expenses = [item for item in chunk if item['user_name'] in users]
+                if period:
+                    # Лист месяца отвечает только за свой месяц
+                    in_period = [item for item in sheet_expenses if period[0] <= item['created_at'] < period[1]]
+                    foreign += len(sheet_expenses) - len(in_period)
+                    sheet_expenses = in_period
+                async with AsyncSessionLocal() as db:
+                    to_insert, to_update = await self._match_chunk(db, sheet_expenses, matched, force)
+                    await self._insert_sheet_expenses(db, to_insert, users)
+                    await self._update_sheet_expenses(db, to_update, users)
+                    # Транзакция пачки закрывается до чтения следующей из очереди
+                    await db.commit()
+                progress["total"] += len(sheet_expenses)
+                progress["inserted"] += len(to_insert)
+                progress["updated"] += len(to_update)
+        finally:
+            reader.cancel()
+        if foreign:
+            logger.warning(f"Skipped {foreign} rows in '{title}' with time outside of the sheet month")
+    
+    def _get_expenses_handle(self, title: str):
+        """Лист расходов из кэша без создания (выполняется в пуле потоков)"""
+        with self._cache_lock:
+            return self._get_worksheet(title)
+    
+    def _load_expense_chunk(self, title: str, start_row: int, end_row: int) -> List[List[str]]:
+        """Чтение строк start_row..end_row листа расходов (выполняется в пуле потоков)"""
+        try:
+            worksheet = self._get_expenses_handle(title)
+            return worksheet.get(f"A{start_row}:G{end_row}")
+        except (gspread.WorksheetNotFound, gspread.exceptions.APIError) as e:
+            self._handle_sheet_error(e, title)
+            raise
+    
+    def _load_expense_height(self, title: str) -> int:
+        """Номер последней строки с датой в листе расходов (выполняется в пуле потоков)"""
+        try:
+            worksheet = self._get_expenses_handle(title)
+            # Google отбрасывает пустые ячейки в конце колонки, дата есть в каждой строке
+            return len(worksheet.col_values(1))
+        except (gspread.WorksheetNotFound, gspread.exceptions.APIError) as e:
+            self._handle_sheet_error(e, title)
+            raise
+    
+    async def _read_expense_chunks(self, chunks: asyncio.Queue, title: str):
+        """Чтение листа пачками в очередь; None - конец, исключение - ошибка"""
+        try:
+            # Высота читается заранее: пустой диапазон посреди листа - не конец данных,
+            # иначе строки ниже него были бы удалены из базы как исчезнувшие
+            height = await sheets_executor.run(
+                self._load_expense_height, title,
+                priority=PRIORITY_BACKGROUND,
+                timeout=config.SHEETS_SYNC_TIMEOUT
+            )
+            start_row = 2  # Первая строка - заголовки
+            while start_row <= height:
+                end_row = min(start_row + config.SYNC_CHUNK_ROWS - 1, height)
+                # Фоновая синхронизация уступает квоту интерактивным запросам
+                values = await sheets_executor.run(
+                    self._load_expense_chunk, title, start_row, end_row,
+                    priority=PRIORITY_BACKGROUND,
+                    timeout=config.SHEETS_SYNC_TIMEOUT
+                )
+                chunk = []
+                for row in values:
+                    expense_data = _parse_expense_row(row)
+                    if expense_data:
+                        chunk.append(expense_data)
+                # put ждет, пока запись в базу не освободит место в очереди
+                await chunks.put(chunk)
+                start_row = end_row + 1
+            await chunks.put(None)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await chunks.put(e)
+    
+    async def _match_chunk(self, db, sheet_expenses: List[Dict], matched: bytearray,
+                           force: bool = False) -> Tuple[List[Dict], List[Tuple[int, Dict]]]:
+        """Сопоставление пачки строк листа с локальными расходами
+
+        Строки с ID сопоставляются по ключу, строки без ID (внесенные вручную) -
+        по отпечаткам. Совпавшие расходы отмечаются в matched. Возвращает
+        строки для вставки и пары (id расхода, строка) для обновления;
+        force=True обновляет все совпавшие расходы (полная синхронизация).
+        """
+        from database.models import Expense
+        from sqlalchemy import select
+        
+        uuids = list({item['uuid'] for item in sheet_expenses if item['uuid']})
+        local_by_uuid = {}
+        for i in range(0, len(uuids), SYNC_DELETE_BATCH_SIZE):
+            result = await db.execute(
+                select(Expense.sheet_uuid, Expense.id, Expense.sheet_fingerprint)
+                .where(Expense.sheet_uuid.in_(uuids[i:i + SYNC_DELETE_BATCH_SIZE]))
+            )
+            for expense_uuid, expense_id, fingerprint in result.all():
+                local_by_uuid[expense_uuid] = (expense_id, fingerprint)
+        
+        fingerprints = list({item['fingerprint'] for item in sheet_expenses if not item['uuid']})
+        local_ids = defaultdict(list)
+        for i in range(0, len(fingerprints), SYNC_DELETE_BATCH_SIZE):
+            result = await db.execute(
+                select(Expense.id, Expense.sheet_fingerprint)
+                .where(
+                    Expense.sheet_fingerprint.in_(fingerprints[i:i + SYNC_DELETE_BATCH_SIZE]),
+                    Expense.sheet_uuid.is_(None)
+                )
+            )
+            for expense_id, fingerprint in result.all():
+                # Расходы, вставленные этой синхронизацией или уже совпавшие, пропускаем
+                if expense_id < len(matched) and not matched[expense_id]:
+                    local_ids[fingerprint].append(expense_id)
+        
+        to_insert, to_update = [], []
+        new_uuids = set()
+        for expense_data in sheet_expenses:
+            expense_uuid = expense_data['uuid']
+            if expense_uuid:
+                local = local_by_uuid.get(expense_uuid)
+                if local is None:
+                    # Повтор ID в листе вставляется один раз
+                    if expense_uuid not in new_uuids:
+                        new_uuids.add(expense_uuid)
+                        to_insert.append(expense_data)
+                    continue
+                expense_id, fingerprint = local
+                if expense_id >= len(matched) or matched[expense_id]:
+                    continue
+                matched[expense_id] = 1
+                # Строку правили в листе - обновляем расход на месте
+                if force or fingerprint != expense_data['fingerprint']:
+                    to_update.append((expense_id, expense_data))
+                continue
+            
+            # Одинаковые строки без ID допустимы, поэтому сравниваем количества
+            ids = local_ids.get(expense_data['fingerprint'])
+            if ids:
+                expense_id = ids.pop()
+                matched[expense_id] = 1
+                if force:
+                    to_update.append((expense_id, expense_data))
+            else:
+                to_insert.append(expense_data)
+        return to_insert, to_update
+    
+    async def _delete_unmatched(self, db, matched: bytearray, unsent_ids: set,
+                                period: Optional[Tuple[datetime, datetime]] = None) -> int:
+        """Удаление расходов (за период), которых больше нет в листе, возвращает их число"""
+        from database.models import Expense
+        from sqlalchemy import select, delete
+        
+        scope = [Expense.id < len(matched)]
+        if period:
+            scope += [Expense.expense_date >= period[0], Expense.expense_date < period[1]]
+        
+        deleted = 0
+        last_id = 0
+        while True:
+            # Проход по id страницами, чтобы не держать весь список в памяти
+            result = await db.execute(
+                select(Expense.id)
+                .where(Expense.id > last_id, *scope)
+                .order_by(Expense.id)
+                .limit(SYNC_DELETE_BATCH_SIZE)
+            )
+            ids = result.scalars().all()
+            if not ids:
+                return deleted
+            last_id = ids[-1]
+            
+            # Несверенные расходы (без строки в листе) заменяются строками из листа
+            to_delete = [i for i in ids if not matched[i] and i not in unsent_ids]
+            if to_delete:
+                await db.execute(delete(Expense).where(Expense.id.in_(to_delete)))
+                deleted += len(to_delete)
+    
+    async def _insert_sheet_expenses(self, db, sheet_expenses: List[Dict], users: Dict):
+        """Массовое добавление расходов из Google Sheets (без коммита)"""
+        from database.crud import CategoryCRUD, ExpenseCRUD
+        
+        # Все категории - одним запросом, недостающие - одной вставкой
+        category_ids = await CategoryCRUD.get_or_create_categories(
+            db, {item['category'] for item in sheet_expenses if item['category']}
+        )
+        
+        rows = [_expense_values(expense_data, users, category_ids) for expense_data in sheet_expenses]
+        await ExpenseCRUD.bulk_create_expenses(db, rows)
+    
+    async def _update_sheet_expenses(self, db, to_update: List[Tuple[int, Dict]], users: Dict):
+        """Обновление измененных в листе расходов одним executemany (без коммита)"""
+        from database.crud import CategoryCRUD, ExpenseCRUD
+        
+        if not to_update:
+            return
+        category_ids = await CategoryCRUD.get_or_create_categories(
+            db, {item['category'] for _, item in to_update if item['category']}
+        )
+        await ExpenseCRUD.bulk_update_expenses(db, {
+            expense_id: _expense_values(expense_data, users, category_ids)
+            for expense_id, expense_data in to_update
+        })
+
+def _expense_values(expense_data: Dict, users: Dict, category_ids: Dict[str, int]) -> Dict:
+    """Значения колонок expenses для разобранной строки листа"""
+    return {
+        'user_id': users[expense_data['user_name']].id,
+        'category_id': category_ids.get(expense_data['category']),
+        'amount': expense_data['amount'],
+        'purpose': expense_data['purpose'],
+        'expense_date': expense_data['created_at'],
+        'created_at': expense_data['created_at'],
+        'sheet_fingerprint': expense_data['fingerprint'],
+        'sheet_uuid': expense_data['uuid']
+    }
+
+def build_expense_row(user_name: str, amount: float, purpose: str, expense_date: datetime,
+                      category: str = None, expense_uuid: str = None) -> List:
+    """Строка листа "Расходы" для расхода"""
+    row = [
+        expense_date.strftime("%d.%m.%Y"),
+        user_name,
+        float(amount),
+        category or "Не указана",
+        purpose,
+        expense_date.strftime("%d.%m.%Y %H:%M:%S")
+    ]
+    if expense_uuid:
+        row.append(expense_uuid)
+    return row
+
+def expense_row_fingerprint(row: List) -> str:
+    """Отпечаток строки build_expense_row таким, каким его посчитает синхронизация"""
+    return _row_fingerprint([cell_text(value) for value in row])
+
+def month_sheet_title(month: str) -> str:
+    """Название листа месяца, month в формате YYYY-MM"""
+    return f"{EXPENSES_SHEET} {month}"
+
+def _row_month(row: List) -> Optional[str]:
+    """Месяц строки расходов по времени записи, None если время некорректно"""
+    try:
+        return datetime.strptime(str(row[5]), "%d.%m.%Y %H:%M:%S").strftime("%Y-%m")
+    except (ValueError, IndexError):
+        return None
+
+def _month_bounds(month: str) -> Tuple[datetime, datetime]:
+    """Полуоткрытый интервал [начало месяца, начало следующего)"""
+    start = datetime.strptime(month, "%Y-%m")
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    return start, end
+
+def _index_row(month: str) -> List[str]:
+    """Строка оглавления: формулы пересчитываются Google при любой правке листа"""
+    ref = f"'{month_sheet_title(month)}'"
+    return [
+        month_sheet_title(month),
+        month,
+        f"=COUNTA({ref}!A2:A)",
+        f'=COUNTA({ref}!A2:F)&"/"&SUM({ref}!C2:C)&"/"&SUMPRODUCT(LEN({ref}!A2:F))'
+    ]
+
+def _users_key(users: Dict) -> str:
+    """Отпечаток набора пользователей для отметок синхронизации"""
+    payload = "\x1f".join(sorted(users))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+
+def _row_fingerprint(row: List[str]) -> str:
+    """Отпечаток строки листа "Расходы" (первые шесть колонок)"""
+    # Диапазонное чтение отбрасывает пустые ячейки в конце строки - дополняем
+    cells = (list(row) + [""] * 6)[:6]
+    payload = "\x1f".join(cell.strip() for cell in cells)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+def _parse_expense_row(row: List[str]) -> Optional[Dict]:
+    """Разбор строки листа "Расходы", None для некорректных строк"""
+    if len(row) < 6:
+        return None
+    try:
+        category_value = row[3] if len(row) > 3 and row[3] and row[3].strip() != "Не указана" else None
+        
+        return {
+            'date': datetime.strptime(row[0], "%d.%m.%Y").date(),
+            'user_name': row[1],
+            'amount': float(row[2]),
+            'category': category_value,
+            'purpose': row[4],
+            'created_at': datetime.strptime(row[5], "%d.%m.%Y %H:%M:%S"),
+            'fingerprint': _row_fingerprint(row),
+            'uuid': (row[6].strip() or None) if len(row) > 6 else None
+        }
+    except (ValueError, IndexError) as e:
+        logger.warning(f"Skipping invalid row in Google Sheets: {row}, error: {e}")
+        return None
 
 # Глобальный экземпляр сервиса
-google_sheets_service = GoogleSheetsService()
\ No newline at end of file
+google_sheets_service = GoogleSheetsService()
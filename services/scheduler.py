@@ -5,6 +5,7 @@ from database.database import AsyncSessionLocal
 from database.crud import UserCRUD, ReminderCRUD
 from services.notifications import NotificationService
 from config import config
+import asyncio
 import pytz
 import logging
 from datetime import datetime, date
@@ -60,15 +61,16 @@ class SchedulerService:
         """Отправка ежедневных напоминаний в 20:00"""
         logger.info("Sending daily reminders")
         
+        # Напоминания всем пользователям - одной вставкой и одним коммитом
         async with AsyncSessionLocal() as db:
             users = await UserCRUD.get_all_authorized_users(db)
-            
-            for user in users:
-                # Создаем напоминание в БД
-                await ReminderCRUD.create_daily_reminder(db, user.id, datetime.now())
-                
-                # Отправляем уведомление
-                await self.notification_service.send_daily_reminder(user.telegram_id)
+            await ReminderCRUD.create_daily_reminders(db, [user.id for user in users], datetime.now())
+            await db.commit()
+        
+        # Рассылка уже без соединения с базой
+        await self._fan_out(
+            self.notification_service.send_daily_reminder(user.telegram_id) for user in users
+        )
     
     async def _send_hourly_reminders(self):
         """Отправка почасовых напоминаний для тех, кто не ответил"""
@@ -80,18 +82,29 @@ class SchedulerService:
         
         logger.info("Sending hourly reminders")
         
+        # Счетчики всех невыполненных напоминаний - одним UPDATE
         async with AsyncSessionLocal() as db:
-            today = date.today()
-            pending_reminders = await ReminderCRUD.get_pending_reminders(db, today)
-            
-            for reminder in pending_reminders:
-                reminder.reminder_count += 1
-                await db.commit()
-                
-                await self.notification_service.send_hourly_reminder(
-                    reminder.user.telegram_id, 
-                    reminder.reminder_count
-                )
+            pending = await ReminderCRUD.increment_pending_reminders(db, date.today())
+            await db.commit()
+        
+        await self._fan_out(
+            self.notification_service.send_hourly_reminder(telegram_id, reminder_count)
+            for telegram_id, reminder_count in pending
+        )
+    
+    async def _fan_out(self, sends):
+        """Параллельная отправка сообщений с ограничением одновременных запросов"""
+        semaphore = asyncio.Semaphore(config.REMINDER_SEND_CONCURRENCY)
+        
+        async def send(coro):
+            async with semaphore:
+                await coro
+        
+        # Ошибки отправки логирует NotificationService, остальные не прерывают рассылку
+        results = await asyncio.gather(*(send(coro) for coro in sends), return_exceptions=True)
+        for error in results:
+            if isinstance(error, Exception):
+                logger.error(f"Error sending reminder: {error}")
     
     async def _reset_daily_reminders(self):
         """Сброс напоминаний в полночь"""
@@ -105,6 +118,10 @@ class SchedulerService:
             from services.google_sheets import google_sheets_service
             await google_sheets_service.sync_expenses_from_sheets()
             logger.info("Automatic data sync completed successfully")
+            
+            # Популярные графики рисуются заранее в фоне
+            from services.chart_warmup import chart_warmup
+            chart_warmup.schedule()
         except Exception as e:
             logger.error(f"Automatic data sync failed: {e}")
     
@@ -0,0 +1,40 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+class SharedTasks:
+    """Одна задача на ключ для всех одновременных запросов
+
+    Ожидающие получают результат через shield: отмена одного из них не
+    прерывает общую задачу. keep=True оставляет удачный результат для
+    следующих запросов до clear(), иначе завершенная задача забывается.
+    """
+
+    def __init__(self, keep: bool = False):
+        self.keep = keep
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+
+    def start(self, key: Hashable, factory: Callable[[], Awaitable]) -> asyncio.Task:
+        """Текущая задача по ключу или новая из factory()"""
+        task = self._tasks.get(key)
+        if task is None or (task.done() and not self._reusable(task)):
+            task = asyncio.create_task(factory())
+            self._tasks[key] = task
+            if not self.keep:
+                task.add_done_callback(lambda done: self._forget(key, done))
+        return task
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable]) -> Any:
+        """Результат общей задачи по ключу"""
+        return await asyncio.shield(self.start(key, factory))
+
+    def clear(self):
+        """Забыть все задачи (сохраненные результаты устарели)"""
+        self._tasks = {}
+
+    def _reusable(self, task: asyncio.Task) -> bool:
+        return self.keep and not task.cancelled() and task.exception() is None
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        # По ключу уже может лежать новая задача
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
@@ -0,0 +1,256 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+import gspread
+from gspread.utils import a1_range_to_grid_range
+from services.sheets_rate_limiter import sheets_rate_limiter, READ, WRITE
+from config import config
+
+logger = logging.getLogger(__name__)
+
+class QuotaClient(gspread.Client):
+    """Клиент gspread, который перед каждым HTTP-запросом ждет квоту"""
+
+    def request(self, method, endpoint, *args, **kwargs):
+        sheets_rate_limiter.charge_call(READ if method.lower() == "get" else WRITE)
+        return super().request(method, endpoint, *args, **kwargs)
+
+class GspreadBackend:
+    """Настоящий Google Sheets через gspread и service account"""
+
+    scope = [
+        'https://spreadsheets.google.com/feeds',
+        'https://www.googleapis.com/auth/drive'
+    ]
+
+    def open(self):
+        """Подключение к таблице, возвращает (client, spreadsheet)"""
+        from oauth2client.service_account import ServiceAccountCredentials
+
+        # Сначала пробуем переменную окружения (для Railway)
+        credentials_json = os.getenv("GOOGLE_CREDENTIALS_JSON")
+        if credentials_json:
+            try:
+                credentials_data = json.loads(credentials_json)
+                credentials = ServiceAccountCredentials.from_json_keyfile_dict(
+                    credentials_data, self.scope
+                )
+            except json.JSONDecodeError:
+                logger.error("Invalid GOOGLE_CREDENTIALS_JSON format")
+                # Fallback на файл
+                credentials = ServiceAccountCredentials.from_json_keyfile_name(
+                    config.GOOGLE_CREDENTIALS, self.scope
+                )
+        else:
+            # Fallback на файл (для локального запуска)
+            credentials = ServiceAccountCredentials.from_json_keyfile_name(
+                config.GOOGLE_CREDENTIALS, self.scope
+            )
+        client = gspread.authorize(credentials, client_factory=QuotaClient)
+        # Таймаут HTTP-запросов, чтобы зависший вызов не занимал поток пула
+        client.set_timeout(config.SHEETS_CALL_TIMEOUT)
+        return client, client.open_by_key(config.GOOGLE_SHEETS_ID)
+
+class _FakeResponse:
+    """Минимальный ответ для gspread.exceptions.APIError"""
+
+    def __init__(self, status_code: int, message: str):
+        self.status_code = status_code
+        self.text = message
+        self._payload = {"error": {"code": status_code, "message": message, "status": "RESOURCE_EXHAUSTED"}}
+
+    def json(self):
+        return self._payload
+
+def cell_text(value) -> str:
+    """Значение ячейки в том виде, в каком его читает Google (целые числа без ".0")"""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return "" if value is None else str(value)
+
+class LocalWorksheet:
+    """Лист в памяти с подмножеством API gspread.Worksheet, которое использует бот"""
+
+    def __init__(self, spreadsheet: "LocalSpreadsheet", title: str, rows: List[List[str]] = None):
+        self._spreadsheet = spreadsheet
+        self.title = title
+        self._rows = rows or []
+
+    @property
+    def row_count(self) -> int:
+        return len(self._rows)
+
+    def _read(self):
+        self._spreadsheet._simulate_call(READ)
+
+    def get_all_values(self) -> List[List[str]]:
+        self._read()
+        with self._spreadsheet._lock:
+            width = max((len(row) for row in self._rows), default=0)
+            return [row + [""] * (width - len(row)) for row in self._rows]
+
+    def get(self, range_name: str) -> List[List[str]]:
+        self._read()
+        grid = a1_range_to_grid_range(range_name)
+        start_col, end_col = grid.get("startColumnIndex", 0), grid.get("endColumnIndex")
+        with self._spreadsheet._lock:
+            rows = self._rows[grid.get("startRowIndex", 0):grid.get("endRowIndex")]
+            values = [row[start_col:end_col] for row in rows]
+        # Как и Google, отбрасываем пустые строки в конце диапазона
+        while values and not any(values[-1]):
+            values.pop()
+        return values
+
+    def hide_columns(self, start: int, end: int):
+        # Видимость колонок в локальной таблице не хранится
+        self._spreadsheet._simulate_call()
+
+    def update_title(self, title: str):
+        self._spreadsheet._simulate_call()
+        with self._spreadsheet._lock:
+            self._spreadsheet._worksheets[title] = self._spreadsheet._worksheets.pop(self.title)
+            self.title = title
+            self._spreadsheet._changed()
+
+    def row_values(self, row: int) -> List[str]:
+        self._read()
+        return list(self._rows[row - 1]) if row <= len(self._rows) else []
+
+    def col_values(self, col: int) -> List[str]:
+        self._read()
+        values = [row[col - 1] if len(row) >= col else "" for row in self._rows]
+        while values and not values[-1]:
+            values.pop()
+        return values
+
+    def append_row(self, values: List, **kwargs):
+        self.append_rows([values])
+
+    def append_rows(self, values: List[List], **kwargs):
+        self._spreadsheet._simulate_call()
+        with self._spreadsheet._lock:
+            self._rows.extend([cell_text(value) for value in row] for row in values)
+            self._spreadsheet._changed()
+
+    def update(self, range_name: str, values: List[List] = None, **kwargs):
+        self._spreadsheet._simulate_call()
+        grid = a1_range_to_grid_range(range_name)
+        start_row, start_col = grid.get("startRowIndex", 0), grid.get("startColumnIndex", 0)
+        with self._spreadsheet._lock:
+            for i, row_values in enumerate(values or []):
+                self._set_row(start_row + i, start_col, row_values)
+            self._spreadsheet._changed()
+
+    def update_cell(self, row: int, col: int, value):
+        self._spreadsheet._simulate_call()
+        with self._spreadsheet._lock:
+            self._set_row(row - 1, col - 1, [value])
+            self._spreadsheet._changed()
+
+    def _set_row(self, row_index: int, start_col: int, row_values: List):
+        while len(self._rows) <= row_index:
+            self._rows.append([])
+        row = self._rows[row_index]
+        if len(row) < start_col + len(row_values):
+            row.extend([""] * (start_col + len(row_values) - len(row)))
+        for j, value in enumerate(row_values):
+            row[start_col + j] = cell_text(value)
+
+class LocalSpreadsheet:
+    """Таблица в памяти (опционально с сохранением в JSON-файл)
+
+    latency - задержка каждого вызова в секундах, quota_error_rate - доля
+    вызовов, которые завершаются ошибкой 429, как при превышении квоты.
+    """
+
+    def __init__(self, path: Optional[str] = None, latency: float = 0.0, quota_error_rate: float = 0.0):
+        self.path = path
+        self.latency = latency
+        self.quota_error_rate = quota_error_rate
+        self.id = "local"
+        self._lock = threading.RLock()
+        self._worksheets: Dict[str, LocalWorksheet] = {}
+        self._modified = datetime.now(timezone.utc)
+        if path and os.path.exists(path):
+            self._load()
+
+    def _simulate_call(self, kind: str = WRITE):
+        # Квота считается так же, как для запросов к Google
+        sheets_rate_limiter.charge_call(kind)
+        if self.latency:
+            time.sleep(self.latency)
+        if self.quota_error_rate and random.random() < self.quota_error_rate:
+            raise gspread.exceptions.APIError(_FakeResponse(429, "Quota exceeded (simulated)"))
+
+    def _changed(self):
+        # Время изменения как у Drive API, файл обновляется сразу
+        self._modified = datetime.now(timezone.utc)
+        self.save()
+
+    def _load(self):
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        for title, rows in data.get("worksheets", {}).items():
+            self._worksheets[title] = LocalWorksheet(self, title, rows)
+
+    def save(self):
+        """Атомарное сохранение таблицы в файл"""
+        if not self.path:
+            return
+        with self._lock:
+            data = {"worksheets": {title: ws._rows for title, ws in self._worksheets.items()}}
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+
+    def worksheet(self, title: str) -> LocalWorksheet:
+        self._simulate_call(READ)
+        try:
+            return self._worksheets[title]
+        except KeyError:
+            raise gspread.WorksheetNotFound(title)
+
+    def worksheets(self) -> List[LocalWorksheet]:
+        self._simulate_call(READ)
+        return list(self._worksheets.values())
+
+    def add_worksheet(self, title: str, rows, cols, **kwargs) -> LocalWorksheet:
+        self._simulate_call()
+        with self._lock:
+            if title in self._worksheets:
+                raise gspread.exceptions.APIError(_FakeResponse(400, f"Sheet '{title}' already exists"))
+            worksheet = LocalWorksheet(self, title)
+            self._worksheets[title] = worksheet
+            self._changed()
+        return worksheet
+
+    def get_lastUpdateTime(self) -> str:
+        self._simulate_call(READ)
+        return self._modified.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+class LocalSheetsBackend:
+    """Локальная замена Google Sheets для тестов и бенчмарков"""
+
+    def __init__(self, path: Optional[str] = None, latency: float = 0.0, quota_error_rate: float = 0.0):
+        self.spreadsheet = LocalSpreadsheet(path, latency, quota_error_rate)
+
+    def open(self):
+        # В роли client выступает сам backend
+        return self, self.spreadsheet
+
+def get_sheets_backend():
+    """Backend по настройке SHEETS_BACKEND: google (по умолчанию) или local"""
+    if config.SHEETS_BACKEND == "local":
+        logger.info("Using local Google Sheets backend")
+        return LocalSheetsBackend(
+            path=config.SHEETS_LOCAL_PATH or None,
+            latency=config.SHEETS_LOCAL_LATENCY_MS / 1000,
+            quota_error_rate=config.SHEETS_LOCAL_QUOTA_ERROR_RATE
+        )
+    return GspreadBackend()
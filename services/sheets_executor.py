@@ -0,0 +1,103 @@
+import asyncio
+import functools
+import logging
+import random
+from concurrent.futures import ThreadPoolExecutor
+import gspread
+from services.sheets_rate_limiter import sheets_rate_limiter, READ, PRIORITY_INTERACTIVE
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Ответы Google, после которых запрос имеет смысл повторить
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+class SheetsExecutor:
+    """Выделенный пул потоков для блокирующих вызовов gspread
+
+    Все обращения к Google Sheets выполняются вне event loop, чтобы медленный
+    ответ API не останавливал polling, планировщик и других пользователей.
+    Число одновременно ожидающих вызовов ограничено, у каждого вызова есть таймаут.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, timeout: float):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sheets")
+        self._semaphore = asyncio.Semaphore(max_pending)
+
+    async def run(self, func, *args, kind: str = READ, priority: int = PRIORITY_INTERACTIVE,
+                  timeout: float = None, **kwargs):
+        """Выполнение вызова Google Sheets с учетом квоты и повторами
+
+        Каждый HTTP-запрос внутри func ждет квоту своего вида (чтение/запись)
+        с учетом приоритета. Токен вида kind для первого такого запроса
+        берется до занятия потока, остальные - в потоке перед запросом.
+        На 429 и 5xx вызов повторяется с экспоненциальной паузой и случайным
+        разбросом, таймаут действует на каждую попытку.
+        """
+        for attempt in range(config.SHEETS_MAX_RETRIES + 1):
+            await sheets_rate_limiter.acquire(kind, priority)
+            try:
+                return await self._run_once(func, *args, kind=kind, priority=priority, timeout=timeout, **kwargs)
+            except gspread.exceptions.APIError as e:
+                status = getattr(e.response, "status_code", None)
+                if status not in RETRYABLE_STATUSES:
+                    raise
+                sheets_rate_limiter.record_error(getattr(e, "quota_kind", kind), status)
+                if attempt == config.SHEETS_MAX_RETRIES:
+                    raise
+                sheets_rate_limiter.counters["retries"] += 1
+                
+                delay = min(config.SHEETS_BACKOFF_BASE * 2 ** attempt, config.SHEETS_BACKOFF_MAX)
+                delay *= random.uniform(0.5, 1.5)
+                logger.warning(
+                    f"Google Sheets call {getattr(func, '__name__', func)} got HTTP {status}, "
+                    f"retry {attempt + 1}/{config.SHEETS_MAX_RETRIES} in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+
+    async def _run_once(self, func, *args, kind: str = READ, priority: int = PRIORITY_INTERACTIVE,
+                        timeout: float = None, **kwargs):
+        """Выполнение блокирующей функции в пуле с таймаутом
+
+        При таймауте или отмене ожидающей задачи вызов, еще не взятый потоком,
+        снимается с очереди. Уже запущенный HTTP-запрос дорабатывает в потоке
+        и ограничен таймаутом самого gspread-клиента.
+        """
+        timeout = timeout or self.timeout
+        loop = asyncio.get_running_loop()
+
+        async with self._semaphore:
+            future = loop.run_in_executor(
+                self._executor,
+                functools.partial(self._call_in_thread, loop, kind, priority, func, args, kwargs)
+            )
+            try:
+                return await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Google Sheets call {getattr(func, '__name__', func)} timed out after {timeout}s")
+                raise
+
+    @staticmethod
+    def _call_in_thread(loop, kind: str, priority: int, func, args, kwargs):
+        """Вызов в потоке пула с учетом квоты на каждый запрос к API"""
+        with sheets_rate_limiter.call_scope(loop, priority, prepaid=kind) as scope:
+            try:
+                return func(*args, **kwargs)
+            except gspread.exceptions.APIError as e:
+                # 429 относится к квоте запроса, на котором вызов упал
+                e.quota_kind = scope.last_kind
+                raise
+
+    def shutdown(self):
+        """Остановка пула с отменой невыполненных вызовов"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        logger.info("Google Sheets executor stopped")
+
+# Глобальный экземпляр пула
+sheets_executor = SheetsExecutor(
+    max_workers=config.SHEETS_EXECUTOR_WORKERS,
+    max_pending=config.SHEETS_EXECUTOR_MAX_PENDING,
+    timeout=config.SHEETS_CALL_TIMEOUT
+)
@@ -0,0 +1,105 @@
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional
+from database.database import AsyncSessionLocal
+from database.crud import OutboxCRUD
+from config import config
+
+logger = logging.getLogger(__name__)
+
+class SheetsOutboxService:
+    """Отложенная запись расходов в Google Sheets через таблицу sheets_outbox
+
+    Обработчик сохраняет строку для листа в той же транзакции, что и расход,
+    и сразу отвечает пользователю. Фоновый flusher собирает накопившиеся
+    строки и отправляет их одним append_rows: по достижении размера пачки
+    или по таймеру. Неудачные отправки повторяются с растущей паузой.
+    """
+
+    def __init__(self):
+        self.batch_size = config.OUTBOX_BATCH_SIZE
+        self.flush_interval = config.OUTBOX_FLUSH_INTERVAL
+        self.max_batch_rows = config.OUTBOX_MAX_BATCH_ROWS
+        self._queued = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def enqueue(self, db, expense_id: int, row_data: List):
+        """Постановка строки листа в очередь на отправку (без коммита)"""
+        OutboxCRUD.add_entry(db, expense_id, json.dumps(row_data, ensure_ascii=False))
+
+    def notify(self):
+        """Сигнал flusher'у после коммита новых строк"""
+        self._queued += 1
+        if self._wakeup and self._queued >= self.batch_size:
+            self._wakeup.set()
+
+    def start(self):
+        """Запуск фонового flusher'а"""
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info("Sheets outbox flusher started")
+
+    async def stop(self):
+        """Остановка flusher'а с последней попыткой отправки"""
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self.flush()
+        logger.info("Sheets outbox flusher stopped")
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            self._queued = 0
+            await self.flush()
+
+    async def flush(self) -> int:
+        """Отправка всех готовых строк пачками, возвращает число отправленных"""
+        from services.google_sheets import google_sheets_service
+
+        sent = 0
+        while True:
+            async with AsyncSessionLocal() as db:
+                entries = await OutboxCRUD.get_ready_entries(db, datetime.utcnow(), self.max_batch_rows)
+                if not entries:
+                    return sent
+
+                entry_ids = [entry.id for entry in entries]
+                rows = [json.loads(entry.row_data) for entry in entries]
+                # После прошлой попытки строки могли дойти до листа - сверяем по ID
+                attempts = max(entry.attempts or 0 for entry in entries)
+                # Попытка учитывается до отправки: если ответ потеряется (таймаут,
+                # отмена при остановке бота, падение процесса), повтор сверит ID
+                await OutboxCRUD.mark_attempted(db, entry_ids)
+                try:
+                    await google_sheets_service.append_expense_rows(rows, check_existing=attempts > 0)
+                except Exception as e:
+                    # Пауза растет с числом попыток самой "старой" строки пачки
+                    delay = min(self.flush_interval * 2 ** attempts, config.OUTBOX_MAX_RETRY_DELAY)
+                    await OutboxCRUD.mark_failed(
+                        db, entry_ids, str(e) or type(e).__name__,
+                        datetime.utcnow() + timedelta(seconds=delay)
+                    )
+                    logger.warning(f"Outbox flush of {len(rows)} rows failed, retry in {delay:.0f}s: {e}")
+                    return sent
+
+                await OutboxCRUD.delete_entries(db, entry_ids)
+                sent += len(rows)
+
+            if len(entries) < self.max_batch_rows:
+                return sent
+
+# Глобальный экземпляр сервиса
+sheets_outbox = SheetsOutboxService()
@@ -0,0 +1,155 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Optional
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Виды запросов - у Google отдельные квоты на чтение и запись
+READ = "read"
+WRITE = "write"
+
+# Чем меньше число, тем раньше запрос получит квоту
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+class TokenBucket:
+    """Token bucket с пополнением до per_minute токенов в минуту"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = float(per_minute)
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_take(self, cost: float = 1) -> bool:
+        self._refill()
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return True
+        return False
+
+    def wait_time(self, cost: float = 1) -> float:
+        """Сколько секунд ждать, пока накопится cost токенов"""
+        self._refill()
+        return max(0.0, (cost - self.tokens) / self.rate)
+
+    def drain(self):
+        """Обнуление бюджета после ответа 429 от Google"""
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+class _CallScope:
+    """Запросы к API одной задачи SheetsExecutor в потоке пула"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, priority: int, prepaid: Optional[str]):
+        self.loop = loop
+        self.priority = priority
+        # Токен этого вида взят еще в event loop, до занятия потока
+        self.prepaid = prepaid
+        self.last_kind = prepaid or READ
+
+class SheetsRateLimiter:
+    """Общий лимитер запросов к Google Sheets с бюджетами чтения и записи
+
+    Запросы ждут токен в очереди по приоритету: интерактивные (добавление
+    расхода, статус) обслуживаются раньше фоновой синхронизации. Токен
+    берется на каждый HTTP-запрос: backend вызывает charge_call перед
+    запросом, поэтому задача из нескольких вызовов gspread платит за каждый.
+    """
+
+    def __init__(self, read_per_minute: int, write_per_minute: int):
+        self._buckets = {READ: TokenBucket(read_per_minute), WRITE: TokenBucket(write_per_minute)}
+        self._waiters = {READ: [], WRITE: []}
+        self._sequence = itertools.count()
+        self._condition = asyncio.Condition()
+        self._local = threading.local()
+        self.counters: Dict[str, int] = defaultdict(int)
+
+    async def acquire(self, kind: str = READ, priority: int = PRIORITY_INTERACTIVE, cost: float = 1):
+        """Ожидание квоты для одного запроса"""
+        condition = self._condition
+        bucket = self._buckets[kind]
+        waiters = self._waiters[kind]
+        entry = (priority, next(self._sequence))
+        throttled = False
+
+        async with condition:
+            heapq.heappush(waiters, entry)
+            try:
+                while not (waiters[0] == entry and bucket.try_take(cost)):
+                    throttled = True
+                    # Первый в очереди ждет пополнения, остальные - своей очереди
+                    delay = bucket.wait_time(cost) if waiters[0] == entry else None
+                    try:
+                        await asyncio.wait_for(condition.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+                heapq.heappop(waiters)
+            except BaseException:
+                waiters.remove(entry)
+                heapq.heapify(waiters)
+                raise
+            finally:
+                condition.notify_all()
+
+        self.counters[f"{kind}_requests"] += 1
+        if throttled:
+            self.counters[f"{kind}_throttled"] += 1
+
+    @contextmanager
+    def call_scope(self, loop: asyncio.AbstractEventLoop, priority: int, prepaid: Optional[str] = None):
+        """Учет запросов к API в текущем потоке пула на время одной задачи"""
+        scope = _CallScope(loop, priority, prepaid)
+        self._local.scope = scope
+        try:
+            yield scope
+        finally:
+            self._local.scope = None
+
+    def charge_call(self, kind: str):
+        """Квота на один HTTP-запрос к API (вызывается backend'ом из потока пула)"""
+        scope = getattr(self._local, "scope", None)
+        if scope is None:
+            # Вызов вне SheetsExecutor, например подготовка данных в бенчмарках
+            return
+        scope.last_kind = kind
+        if scope.prepaid == kind:
+            scope.prepaid = None
+            return
+        # Поток ждет токен в общей очереди event loop с приоритетом задачи
+        asyncio.run_coroutine_threadsafe(self.acquire(kind, scope.priority), scope.loop).result()
+
+    def record_error(self, kind: str, status: int):
+        """Учет ответа 429/5xx; после 429 бюджет этого вида считается исчерпанным"""
+        if status == 429:
+            self._buckets[kind].drain()
+            self.counters["rate_limited_429"] += 1
+        else:
+            self.counters["server_errors_5xx"] += 1
+
+    def stats(self) -> Dict[str, float]:
+        """Счетчики потребленной квоты и текущие остатки бюджетов"""
+        stats = dict(self.counters)
+        for kind, bucket in self._buckets.items():
+            bucket._refill()
+            stats[f"{kind}_available"] = int(bucket.tokens)
+            stats[f"{kind}_per_minute"] = int(bucket.capacity)
+        return stats
+
+# Глобальный экземпляр лимитера
+sheets_rate_limiter = SheetsRateLimiter(
+    read_per_minute=config.SHEETS_READ_QUOTA_PER_MINUTE,
+    write_per_minute=config.SHEETS_WRITE_QUOTA_PER_MINUTE
+)
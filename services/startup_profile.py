@@ -0,0 +1,137 @@
+import importlib.abc
+import logging
+import sys
+import threading
+import time
+from typing import Dict, List, Tuple
+from config import config
+
+logger = logging.getLogger(__name__)
+
+class _TimedLoader(importlib.abc.Loader):
+    """Обертка загрузчика модуля, замеряющая время его выполнения"""
+
+    def __init__(self, profile: "StartupProfile", loader):
+        self._profile = profile
+        self._loader = loader
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        # Импорты из других потоков (фоновый прогрев) не замеряются
+        if threading.current_thread() is not threading.main_thread():
+            return self._loader.exec_module(module)
+        self._profile._enter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._profile._leave(module.__name__)
+
+    def __getattr__(self, name):
+        # get_resource_reader, is_package и прочее - от исходного загрузчика
+        return getattr(self._loader, name)
+
+class _TimedFinder(importlib.abc.MetaPathFinder):
+    """Первый finder в sys.meta_path: оборачивает загрузчики остальных"""
+
+    def __init__(self, profile: "StartupProfile"):
+        self._profile = profile
+        self._resolving = set()
+
+    def find_spec(self, fullname, path, target=None):
+        if fullname in self._resolving:
+            return None
+        self._resolving.add(fullname)
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                        spec.loader = _TimedLoader(self._profile, spec.loader)
+                    return spec
+            return None
+        finally:
+            self._resolving.discard(fullname)
+
+class StartupProfile:
+    """Профиль запуска бота (STARTUP_PROFILE=True)
+
+    Считает время импорта каждого модуля (собственное и с вложенными
+    импортами, как python -X importtime) и отметки этапов запуска вплоть
+    до первого запроса getUpdates, после чего пишет отчет в лог.
+    Время считается от импорта этого модуля, запуск интерпретатора не входит.
+    """
+
+    def __init__(self, enabled: bool, top: int):
+        self.enabled = enabled
+        self.top = top
+        self.started = time.perf_counter()
+        self._finder = None
+        # Стек: суммарное время вложенных импортов текущего модуля
+        self._stack: List[List[float]] = []
+        self.imports: Dict[str, Tuple[float, float]] = {}
+        self.import_total = 0.0
+        self.marks: List[Tuple[str, float]] = []
+        self.reported = False
+
+    def start(self):
+        """Начать замер импортов (до импорта тяжелых модулей)"""
+        if self.enabled and self._finder is None:
+            self._finder = _TimedFinder(self)
+            sys.meta_path.insert(0, self._finder)
+
+    def stop(self):
+        """Прекратить замер импортов"""
+        if self._finder is not None:
+            sys.meta_path.remove(self._finder)
+            self._finder = None
+
+    def mark(self, name: str):
+        """Отметка этапа запуска"""
+        if self.enabled:
+            self.marks.append((name, time.perf_counter() - self.started))
+
+    def _enter(self):
+        self._stack.append([time.perf_counter(), 0.0])
+
+    def _leave(self, name: str):
+        began, nested = self._stack.pop()
+        cumulative = time.perf_counter() - began
+        self.imports[name] = (cumulative - nested, cumulative)
+        if self._stack:
+            self._stack[-1][1] += cumulative
+        else:
+            self.import_total += cumulative
+
+    def report(self):
+        """Отчет в лог: этапы запуска и самые медленные импорты"""
+        if not self.enabled or self.reported:
+            return
+        self.reported = True
+        self.stop()
+
+        lines = ["Startup profile:"]
+        lines += [f"  {seconds:7.3f}s  {name}" for name, seconds in self.marks]
+        lines.append(f"  imports: {len(self.imports)} modules, {self.import_total:.3f}s total")
+        lines.append(f"  {'self':>8} {'cumulative':>11}  module")
+        slowest = sorted(self.imports.items(), key=lambda item: item[1][1], reverse=True)[:self.top]
+        lines += [f"  {own:8.3f} {cumulative:11.3f}  {name}" for name, (own, cumulative) in slowest]
+        logger.info("\n".join(lines))
+
+    def request_middleware(self):
+        """Middleware сессии aiogram: отчет при первом getUpdates"""
+        profile = self
+
+        async def middleware(make_request, bot, method):
+            if not profile.reported and type(method).__name__ == "GetUpdates":
+                profile.mark("first getUpdates")
+                profile.report()
+            return await make_request(bot, method)
+
+        return middleware
+
+# Глобальный экземпляр профиля
+startup_profile = StartupProfile(enabled=config.STARTUP_PROFILE, top=config.STARTUP_PROFILE_TOP)
@@ -0,0 +1,58 @@
+import logging
+import time
+from typing import Dict, Optional, Tuple
+from services.google_sheets import google_sheets_service
+from services.shared_tasks import SharedTasks
+from config import config
+
+logger = logging.getLogger(__name__)
+
+class StatusCache:
+    """Кэш листа "Статус данные" с TTL и stale-while-revalidate
+
+    Свежие данные (моложе ttl) отдаются сразу. Устаревшие тоже отдаются
+    сразу, а обновление запускается в фоне. Только если данных нет или они
+    старше max_stale, запрос ждет Google Sheets. При ошибке обновления
+    пользователь получает последние удачные данные.
+    """
+
+    def __init__(self, ttl: float, max_stale: float):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self._data: Dict = {}
+        self._fetched_at: Optional[float] = None
+        # Одновременные запросы используют одно обновление
+        self._refreshing = SharedTasks()
+
+    def age(self) -> Optional[float]:
+        """Возраст данных в секундах, None если данных нет"""
+        if self._fetched_at is None:
+            return None
+        return time.monotonic() - self._fetched_at
+
+    async def get(self, force_refresh: bool = False) -> Tuple[Dict, Optional[float]]:
+        """Данные статуса и их возраст в секундах"""
+        age = self.age()
+
+        if force_refresh or age is None or age > self.max_stale:
+            await self._refreshing.run("status", self._fetch)
+        elif age > self.ttl:
+            self._refreshing.start("status", self._fetch)
+
+        return self._data, self.age()
+
+    async def _fetch(self):
+        status_data = await google_sheets_service.get_status_data()
+        if status_data:
+            self._data = status_data
+            self._fetched_at = time.monotonic()
+            logger.info("Status cache refreshed")
+        else:
+            # get_status_data уже залогировал ошибку - оставляем прошлые данные
+            logger.warning("Status cache refresh failed, keeping previous data")
+
+# Глобальный экземпляр кэша
+status_cache = StatusCache(
+    ttl=config.STATUS_CACHE_TTL,
+    max_stale=config.STATUS_CACHE_MAX_STALE
+)
@@ -0,0 +1,55 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+from database.models import User
+from config import config
+
+logger = logging.getLogger(__name__)
+
+class UserCache:
+    """LRU-кэш пользователей по telegram_id с TTL
+
+    Авторизованные пользователи хранятся ttl секунд. Отсутствие пользователя
+    или отказ в авторизации тоже кэшируется, но на короткий negative_ttl,
+    чтобы повторные нажатия неавторизованного не ходили в базу, а успешный
+    /auth не ждал долго. При переполнении вытесняются давно не запрошенные.
+    """
+
+    def __init__(self, ttl: float, negative_ttl: float, max_size: int):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        # telegram_id -> (User или None, момент истечения)
+        self._entries: "OrderedDict[int, Tuple[Optional[User], float]]" = OrderedDict()
+
+    def get(self, telegram_id: int) -> Tuple[bool, Optional[User]]:
+        """(найдено в кэше, пользователь или None для отрицательной записи)"""
+        entry = self._entries.get(telegram_id)
+        if entry is None or entry[1] <= time.monotonic():
+            if entry is not None:
+                del self._entries[telegram_id]
+            return False, None
+        self._entries.move_to_end(telegram_id)
+        return True, entry[0]
+
+    def set(self, telegram_id: int, user: Optional[User]):
+        """Запомнить авторизованного пользователя или отрицательный результат"""
+        if user is not None and not user.is_authorized:
+            user = None
+        ttl = self.ttl if user is not None else self.negative_ttl
+        self._entries[telegram_id] = (user, time.monotonic() + ttl)
+        self._entries.move_to_end(telegram_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, telegram_id: int):
+        """Сброс записи после изменения пользователя (например, /auth)"""
+        self._entries.pop(telegram_id, None)
+
+# Глобальный экземпляр кэша
+user_cache = UserCache(
+    ttl=config.USER_CACHE_TTL,
+    negative_ttl=config.USER_CACHE_NEGATIVE_TTL,
+    max_size=config.USER_CACHE_MAX_SIZE
+)
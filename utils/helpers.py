@@ -41,4 +41,13 @@ def format_datetime_kg(dt: datetime) -> str:
     year = dt.year
     time = dt.strftime("%H:%M")
     
-    return f"{day} {month} {year} г. в {time}"
\ No newline at end of file
+    return f"{day} {month} {year} г. в {time}"
+
+def format_age(seconds: float) -> str:
+    """Человекочитаемый возраст данных ("только что", "5 мин назад")"""
+    if seconds < 60:
+        return "только что"
+    minutes = int(seconds // 60)
+    if minutes < 60:
+        return f"{minutes} мин назад"
+    return f"{minutes // 60} ч {minutes % 60} мин назад"